@@ -0,0 +1,254 @@
+"""Benchmark suite for the dashboard's load and scoring pipeline.
+
+    python benchmark.py                              # 1k, 10k and 100k rows
+    python benchmark.py --rows 1000 10000 --output after.json --compare before.json
+
+Synthetic workbooks with the real column schema (see synthetic.py) are
+written once per size, then every stage the dashboard runs is timed on its
+own: Excel parse (column-projected, as uploads are read), key normalization,
+row index build, row lookup, each model's predict (whole file and the
+single-row Predict! path) and feature contributions, a what-if sweep of up
+to 3 activities, the weighted combine, a drift monitor update and figure
+construction.
+--startup also times the dashboard's cold start in fresh interpreters (time
+to first paint and first full run). Each stage reports the median and best
+of --repeat runs plus its peak traced memory, measured in one extra run
+under tracemalloc so tracing does not distort the timings. Results are
+written as JSON; --compare prints the ratio of every stage against an
+earlier run.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from scoring import (
+    MODEL_NAMES, build_row_index, get_model, normalize_keys, predict_model, read_table, required_columns, reweight
+)
+from explain import contributions
+from monitor import DriftMonitor, build_baseline
+from synthetic import make_frame
+from whatif import sweep
+
+# Row counts benchmarked by default
+DEFAULT_ROWS = [1000, 10000, 100000]
+
+# Keys looked up per run of the row lookup stage
+LOOKUPS = 200
+
+# Runs main.py once in Streamlit's app test harness and prints its startup timings
+STARTUP_SCRIPT = """
+import json, os, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(os.path.join(sys.argv[1], 'main.py'), default_timeout=120)
+start = time.perf_counter()
+app.run()
+run = app.session_state['stage_history'].last
+print(json.dumps({'first_paint': run.stages['first_paint'], 'first_run': time.perf_counter() - start}))
+"""
+
+
+# Time fn over repeat runs, then measure its peak traced memory in one more run
+def measure(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, {
+        'seconds': statistics.median(runs),
+        'best': min(runs),
+        'runs': runs,
+        'peak_mb': peak / 2 ** 20,
+    }
+
+
+# Excel bytes of a synthetic workbook, as an upload would deliver them
+def make_workbook(n_rows, seed=0):
+    buffer = io.BytesIO()
+    make_frame(n_rows, seed=seed).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+# Figures drawn for one prediction and for the module overview
+def build_figures(scores):
+    from charts import (
+        build_comparison_bar, build_comparison_chart, build_gauge_chart, build_radar_chart,
+        create_score_heatmap
+    )
+    from scoring import module_style_grid
+
+    row = scores.iloc[0]
+    values = [row[name] for name in MODEL_NAMES]
+    figures = [build_gauge_chart(value, "") for value in values + [row['Final Score']]]
+    figures.append(build_comparison_chart(values, MODEL_NAMES, ["royalblue", "green", "darkred"]))
+    figures.append(build_radar_chart(values, MODEL_NAMES))
+    figures.append(build_comparison_bar(row['Final Score'], sum(values) / len(values)))
+    figures.append(create_score_heatmap(*module_style_grid(scores)))
+    return figures
+
+
+# Time every pipeline stage on a workbook of n_rows rows
+def run_size(n_rows, repeat, figures=True):
+    data = make_workbook(n_rows)
+    stages = {}
+
+    df, stages['excel_parse'] = measure(lambda: read_table(io.BytesIO(data), 'excel', required_columns()), repeat)
+    df, stages['normalize'] = measure(lambda: normalize_keys(df.copy()), repeat)
+    row_index, stages['row_index'] = measure(lambda: build_row_index(df), repeat)
+
+    keys = list(row_index)
+    picks = [keys[i] for i in np.random.default_rng(0).integers(0, len(keys), LOOKUPS)]
+    _, lookup = measure(lambda: [df.iloc[row_index[key][:1]] for key in picks], repeat)
+    stages['row_lookup'] = dict(lookup, seconds=lookup['seconds'] / LOOKUPS, best=lookup['best'] / LOOKUPS,
+                                runs=[run / LOOKUPS for run in lookup['runs']])
+
+    scores = df[['Module Number', 'Style Number']].copy()
+    row = df.iloc[:1]
+    for name in MODEL_NAMES:
+        scores[name], stages[f'predict:{name}'] = measure(lambda: predict_model(name, df), repeat)
+        _, stages[f'predict_row:{name}'] = measure(lambda: predict_model(name, row), repeat * 10)
+        _, stages[f'explain:{name}'] = measure(lambda: contributions(name, df), repeat)
+    _, stages['what_if'] = measure(lambda: sweep(df.iloc[0], 3), repeat * 10)
+
+    scores, stages['combine'] = measure(lambda: reweight(scores), repeat)
+    baseline = build_baseline(df, scores)
+    _, stages['drift_monitor'] = measure(lambda: DriftMonitor(baseline).update(df, scores), repeat)
+    if figures:
+        _, stages['figures'] = measure(lambda: build_figures(scores), repeat)
+
+    stages['total'] = {
+        'seconds': sum(stage['seconds'] for name, stage in stages.items() if name != 'row_lookup'),
+        'peak_mb': max(stage['peak_mb'] for stage in stages.values()),
+    }
+    return {'rows': n_rows, 'workbook_mb': len(data) / 2 ** 20, 'stages': stages}
+
+
+# Cold-start timings of the dashboard, each run in a fresh interpreter
+def run_startup(repeat):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, directory], capture_output=True, text=True,
+                             check=True, cwd=directory).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+    return {
+        name: {'seconds': statistics.median(run[name] for run in runs), 'runs': [run[name] for run in runs]}
+        for name in ['first_paint', 'first_run']
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def environment():
+    import sklearn
+    return {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def print_results(result):
+    print(f"{result['rows']:,} rows ({result['workbook_mb']:.1f} MB workbook)")
+    for name, stage in result['stages'].items():
+        unit = "/lookup" if name == 'row_lookup' else ""
+        print(f"  {name:<24}{stage['seconds'] * 1000:11.2f} ms{unit:<8}{stage['peak_mb']:9.1f} MB peak")
+
+
+# Print the time ratio of every stage against a previous results file
+def print_comparison(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {result['rows']: result for result in json.load(f)['results']}
+    print(f"\nCompared with {baseline_path} (new / old time):")
+    for result in results:
+        old = baseline.get(result['rows'])
+        if old is None:
+            continue
+        print(f"{result['rows']:,} rows")
+        same_stages = result['stages'].keys() == old['stages'].keys()
+        for name, stage in result['stages'].items():
+            if name == 'total' and not same_stages:
+                continue
+            if name in old['stages'] and old['stages'][name]['seconds'] > 0:
+                ratio = stage['seconds'] / old['stages'][name]['seconds']
+                flag = "  slower" if ratio > 1.1 else "  faster" if ratio < 0.9 else ""
+                print(f"  {name:<24}{old['stages'][name]['seconds'] * 1000:11.2f} ms -> "
+                      f"{stage['seconds'] * 1000:11.2f} ms  {ratio:5.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time each stage of the QCO load and scoring pipeline")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help="Workbook sizes to benchmark")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage (median is reported)")
+    parser.add_argument('--no-figures', action='store_true', help="Skip the figure construction stage")
+    parser.add_argument('--startup', action='store_true', help="Also time the dashboard's cold start")
+    parser.add_argument('--output', default='benchmark.json', help="JSON results file")
+    parser.add_argument('--compare', help="Earlier JSON results file to compare against")
+    args = parser.parse_args(argv)
+
+    # Model loading is a one-off cost, timed separately from the per-size stages
+    start = time.perf_counter()
+    for name in MODEL_NAMES:
+        get_model(name)
+    load_seconds = time.perf_counter() - start
+    print(f"model load: {load_seconds * 1000:.0f} ms")
+
+    startup = None
+    if args.startup:
+        startup = run_startup(args.repeat)
+        print(f"startup: first paint {startup['first_paint']['seconds'] * 1000:.0f} ms, "
+              f"first run {startup['first_run']['seconds'] * 1000:.0f} ms")
+
+    results = []
+    for n_rows in args.rows:
+        results.append(run_size(n_rows, args.repeat, figures=not args.no_figures))
+        print_results(results[-1])
+
+    report = {
+        'environment': environment(),
+        'model_load_seconds': load_seconds,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'repeat': args.repeat,
+        'startup': startup,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"max RSS {report['max_rss_mb']:.0f} MB; results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
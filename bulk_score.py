@@ -0,0 +1,250 @@
+"""Score a large Excel, CSV, Parquet or Arrow file in bounded-memory chunks.
+
+    python bulk_score.py history.xlsx scores.csv
+    python bulk_score.py history.parquet scores.parquet --chunk-size 20000 --workers 4
+    python bulk_score.py history.csv scores.csv --history qco_history.sqlite
+
+Only the needed columns are read, chunk by chunk (a column-projected
+stream of the sheet XML for .xlsx, chunked pandas reads for .csv, record
+batches for Parquet and Arrow/Feather; a legacy .xls is read whole),
+matching headers that differ only in case or spacing. Rows left entirely
+blank are skipped in every format. The rows are scored with the same three
+models and weighting as the dashboard (30/60/10 unless --weights is given,
+rescaled over the --models used), and streamed to CSV or Parquet. With
+--history, every chunk is also appended to the dashboard's score history.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+
+import pandas as pd
+
+from parallel import get_pool, shutdown_pool
+from scoring import (
+    MODEL_NAMES, compact_dtypes, match_columns, normalize_keys, normalized_weights, required_columns, score,
+    table_type, unscored_count
+)
+
+
+def check_columns(columns, available):
+    missing = [col for col in columns if col not in available]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(repr(col) for col in missing)}")
+
+
+# File header names of the given columns (matched ignoring case and extra
+# whitespace), raising if any is missing
+def header_names(columns, header):
+    matched = match_columns(header, columns)
+    check_columns(columns, matched)
+    return [matched[col] for col in columns]
+
+
+# Yield DataFrame chunks of the given columns of an .xlsx sheet, parsing
+# only the cells of those columns (see xlsx.py)
+def iter_excel_chunks(path, columns, chunk_size):
+    import xlsx
+
+    def select(header):
+        positions = {name: i for i, name in reversed(list(enumerate(header))) if name is not None}
+        return [positions[name] for name in header_names(columns, header)]
+
+    rows = xlsx.iter_rows(path, select)
+    if next(rows, None) is None:
+        return
+    buffer = []
+    for values in rows:
+        if all(value is None for value in values):
+            continue
+        buffer.append(values)
+        if len(buffer) >= chunk_size:
+            yield compact_dtypes(pd.DataFrame(buffer, columns=columns))
+            buffer = []
+    if buffer:
+        yield compact_dtypes(pd.DataFrame(buffer, columns=columns))
+
+
+# Yield DataFrame chunks of the given columns of a legacy .xls sheet, which
+# cannot be streamed and is read whole
+def iter_xls_chunks(path, columns, chunk_size):
+    df = pd.read_excel(path)
+    df = compact_dtypes(df[header_names(columns, df.columns)].set_axis(columns, axis=1))
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+# Yield DataFrame chunks of a CSV file
+def iter_csv_chunks(path, columns, chunk_size):
+    names = header_names(columns, pd.read_csv(path, nrows=0).columns)
+    for chunk in pd.read_csv(path, usecols=names, chunksize=chunk_size):
+        yield compact_dtypes(chunk[names].set_axis(columns, axis=1))
+
+
+# Yield DataFrame chunks of the given columns of a Parquet file
+def iter_parquet_chunks(path, columns, chunk_size):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    names = header_names(columns, parquet_file.schema_arrow.names)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=names):
+        yield compact_dtypes(batch.to_pandas()[names].set_axis(columns, axis=1))
+
+
+# Yield DataFrame chunks of the given columns of an Arrow IPC / Feather file
+def iter_arrow_chunks(path, columns, chunk_size):
+    import pyarrow.feather as feather
+    import pyarrow.ipc as ipc
+
+    names = header_names(columns, ipc.open_file(path).schema.names)
+    # Memory-mapped, so only the selected columns are read into memory
+    table = feather.read_table(path, columns=names, memory_map=True)
+    for batch in table.to_batches(max_chunksize=chunk_size):
+        yield compact_dtypes(batch.to_pandas()[names].set_axis(columns, axis=1))
+
+
+# Yield normalized DataFrame chunks of an Excel, CSV, Parquet or Arrow file
+def iter_chunks(path, columns, chunk_size):
+    ext = os.path.splitext(path)[1].lower()
+    file_type = table_type(path)
+    if file_type == 'csv':
+        chunks = iter_csv_chunks(path, columns, chunk_size)
+    elif file_type == 'parquet':
+        chunks = iter_parquet_chunks(path, columns, chunk_size)
+    elif file_type == 'arrow':
+        chunks = iter_arrow_chunks(path, columns, chunk_size)
+    elif ext in ('.xlsx', '.xlsm'):
+        chunks = iter_excel_chunks(path, columns, chunk_size)
+    else:
+        chunks = iter_xls_chunks(path, columns, chunk_size)
+
+    for chunk in chunks:
+        # Rows left entirely blank are skipped, as the .xlsx reader does
+        chunk = chunk.dropna(how='all')
+        if len(chunk):
+            yield normalize_keys(chunk.reset_index(drop=True))
+
+
+# Score chunks in input order, optionally across a pool of worker processes;
+# yields (chunk, scores) pairs
+def score_chunks(chunks, flags, workers=1, weights=None):
+    if workers <= 1:
+        for chunk in chunks:
+            yield chunk, score(chunk, *flags, weights=weights)
+        return
+
+    # Each worker loads the models once; at most 2 chunks per worker are in flight
+    pool = get_pool(workers)
+    pending = deque()
+    for chunk in chunks:
+        pending.append((chunk, pool.submit(score, chunk, *flags, weights=weights)))
+        if len(pending) >= workers * 2:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+    while pending:
+        chunk, future = pending.popleft()
+        yield chunk, future.result()
+
+
+# Streams score chunks to a CSV file
+class CsvWriter:
+    def __init__(self, path):
+        self.path = path
+        self.header = True
+
+    def write(self, scores):
+        scores.to_csv(self.path, mode='w' if self.header else 'a', header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        pass
+
+
+# Streams score chunks to a Parquet file (requires pyarrow)
+class ParquetWriter:
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.writer = None
+
+    def write(self, scores):
+        table = self.pa.Table.from_pandas(scores, preserve_index=False)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def open_writer(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return CsvWriter(path)
+    if ext in ('.parquet', '.pq'):
+        return ParquetWriter(path)
+    raise ValueError(f"Unsupported output file type: {ext}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a file of changeovers in chunks")
+    parser.add_argument('input', help="Input .xlsx, .xls, .csv, .parquet or .feather/.arrow file")
+    parser.add_argument('output', help="Output .csv or .parquet file")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="Rows per chunk")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes used for scoring")
+    parser.add_argument('--models', nargs='+', choices=MODEL_NAMES, default=MODEL_NAMES,
+                        help="Models to include in the final score")
+    parser.add_argument('--weights', nargs=len(MODEL_NAMES), type=float, metavar='WEIGHT',
+                        help=f"Weights of {', '.join(MODEL_NAMES)} in the final score (default 0.3 0.6 0.1)")
+    parser.add_argument('--history', metavar='PATH', help="SQLite score history to append the scores to")
+    args = parser.parse_args(argv)
+
+    flags = [name in args.models for name in MODEL_NAMES]
+    try:
+        normalized_weights(args.weights, flags)
+    except ValueError as e:
+        parser.error(str(e))
+    columns = required_columns(args.models)
+
+    start = time.perf_counter()
+    rows = skipped = 0
+    writer = open_writer(args.output)
+    history = None
+    if args.history:
+        from history import ScoreHistory
+        history = ScoreHistory(args.history)
+    try:
+        chunks = iter_chunks(args.input, columns, args.chunk_size)
+        for chunk, scores in score_chunks(chunks, flags, args.workers, args.weights):
+            writer.write(scores)
+            if history is not None:
+                try:
+                    history.add(chunk, scores, source=os.path.basename(args.input))
+                except Exception as e:
+                    # The scores are still written; only the history stops
+                    print(f"\nNot saving to the score history any more: {e}", file=sys.stderr)
+                    history.close()
+                    history = None
+            rows += len(scores)
+            skipped += unscored_count(scores)
+            print(f"\rScored {rows} rows ({time.perf_counter() - start:.1f}s)", end='', file=sys.stderr)
+    finally:
+        writer.close()
+        if history is not None:
+            history.close()
+        shutdown_pool()
+    print(f"\rScored {rows} rows in {time.perf_counter() - start:.1f}s -> {args.output}", file=sys.stderr)
+    if skipped:
+        print(f"{skipped} rows have blank model inputs and were not scored (see 'Missing Inputs')", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Versioned model bundle format.
+
+    python bundle.py export [--out models] [--version 2025.06]
+    python bundle.py info [models]
+
+A bundle is a directory with one uncompressed joblib file per model and a
+manifest.json recording the bundle version, each model's feature list,
+output kind and SHA-256. Forest models also get a directory of flat .npy
+node arrays (see forest.py) that worker processes can share through
+memory-mapping. Models are loaded lazily on first use with mmap_mode='r', and
+each file is checked against its manifest hash before it is deserialized.
+
+The model files are still joblib pickles, as unsafe to load from an
+untrusted source as the .pkl files they replace; the hash check only
+catches files changed or corrupted since export, not a manifest rewritten
+to match them. Model weights are not part of the bundle: they are chosen
+in the dashboard (or with --weights) at scoring time.
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import threading
+
+import joblib
+
+# Bundle layout version understood by this module
+FORMAT_VERSION = 1
+
+MANIFEST_FILE = 'manifest.json'
+
+
+# SHA-256 of a file, read in 1 MB blocks
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Lazily loaded set of models described by a bundle manifest
+class ModelBundle:
+    def __init__(self, path, mmap_mode='r'):
+        self.path = path
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported model bundle format: {self.manifest.get('format_version')}")
+        self._models = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    @property
+    def names(self):
+        return list(self.manifest['models'])
+
+    def features(self, name):
+        return self.manifest['models'][name]['features']
+
+    def model_version(self, name):
+        return f"{self.version}:{self.manifest['models'][name]['sha256'][:12]}"
+
+    # Return a model, loading and verifying it on first use
+    def load(self, name):
+        if name not in self._models:
+            with self._lock:
+                if name not in self._models:
+                    entry = self.manifest['models'][name]
+                    path = os.path.join(self.path, entry['file'])
+                    if file_sha256(path) != entry['sha256']:
+                        raise ValueError(f"Model file {path} does not match the bundle manifest")
+                    self._models[name] = joblib.load(path, mmap_mode=self.mmap_mode)
+        return self._models[name]
+
+    def has_flat_forest(self, name):
+        return 'flat_forest' in self.manifest['models'][name]
+
+    # Flattened forest arrays of a model, memory-mapped from the bundle
+    def load_flat_forest(self, name):
+        from forest import FlatForest
+        path = os.path.join(self.path, self.manifest['models'][name]['flat_forest'])
+        return FlatForest.load(path, self.load(name), mmap_mode=self.mmap_mode)
+
+    def is_loaded(self, name):
+        return name in self._models
+
+
+# Export the pickled models into a bundle directory
+def export_bundle(out_dir, version=None):
+    import sklearn
+
+    from forest import FlatForest
+    from scoring import (
+        FOREST_MODELS, MODEL_DIR, MODEL_FEATURES, MODEL_FILES, MODEL_NAMES, load_model
+    )
+
+    os.makedirs(out_dir, exist_ok=True)
+    models = {}
+    for name in MODEL_NAMES:
+        model = load_model(os.path.join(MODEL_DIR, MODEL_FILES[name]))
+        file_name = name.lower().replace(' ', '_') + '.joblib'
+        path = os.path.join(out_dir, file_name)
+        # Uncompressed so large arrays can be memory-mapped
+        joblib.dump(model, path, compress=0)
+        models[name] = {
+            'file': file_name,
+            'source': MODEL_FILES[name],
+            'features': MODEL_FEATURES[name],
+            'output': 'predict' if name == "Critical Path" else 'predict_proba',
+            'sha256': file_sha256(path),
+        }
+        if name in FOREST_MODELS:
+            # Flat node arrays for the NumPy forest backend, shareable via mmap
+            forest_dir = name.lower().replace(' ', '_') + '.forest'
+            FlatForest.from_pipeline(model).save(os.path.join(out_dir, forest_dir))
+            models[name]['flat_forest'] = forest_dir
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version or datetime.date.today().isoformat(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'sklearn_version': sklearn.__version__,
+        'models': models,
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or inspect a QCO model bundle")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="Export the .pkl models into a bundle")
+    export.add_argument('--out', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+    export.add_argument('--version', help="Bundle version (default: today's date)")
+    info = commands.add_parser('info', help="Show a bundle manifest")
+    info.add_argument('path', nargs='?', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        manifest = export_bundle(args.out, args.version)
+        print(f"Exported bundle {manifest['version']} to {args.out}")
+    else:
+        bundle = ModelBundle(args.path)
+        print(f"Bundle {bundle.version} (format {FORMAT_VERSION})")
+        for name in bundle.names:
+            entry = bundle.manifest['models'][name]
+            print(f"  {name}: {entry['file']}, {len(entry['features'])} features")
+
+
+if __name__ == "__main__":
+    main()
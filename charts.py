@@ -0,0 +1,583 @@
+"""Plotly figures and lightweight HTML charts for the results page.
+
+The build_* functions construct (and validate) a figure from scratch. The
+create_* functions build each kind of figure once as a template, patch in
+the values without re-validating, and keep recent figures in an LRU cache
+keyed by their values (feature contribution charts get one template per
+number of bars). Templates also drop the trace-type defaults of
+unused chart types from the embedded Plotly theme, which is most of each
+chart's JSON payload.
+
+The *_html functions draw the same information as small HTML snippets for
+the lite render mode. The module overview heatmaps are a single trace each,
+however many modules and styles there are.
+
+    python charts.py    # payload size and build time of each render path
+"""
+import copy
+import time
+from functools import lru_cache
+
+import numpy as np
+import plotly.graph_objects as go
+
+from scoring import recommendation_bands
+
+# Number of recent figures kept per chart type
+FIGURE_CACHE_SIZE = 256
+
+# Largest module x style grid drawn cell by cell; bigger overviews are
+# aggregated to style counts per recommendation band
+MAX_HEATMAP_CELLS = 20000
+
+# Grids up to this size get the score printed in each cell
+MAX_LABELLED_CELLS = 400
+
+
+# Build enhanced gauge chart from scratch
+def build_gauge_chart(value, title, color="darkblue", height=300):
+    # Define color gradient based on value
+    if value < 50:
+        bar_color = "firebrick"
+    elif value < 75:
+        bar_color = "orange"
+    else:
+        bar_color = "forestgreen"
+
+    # Create the gauge chart with white bold percentage
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=value,
+        number={
+            'valueformat': '.1f',
+            'suffix': '%',
+            'font': {
+                'size': 28,  # Increased size
+                'color': 'white',  # White color
+                'family': "Arial Black"  # Bold font
+            }
+        },
+        title={
+            'text': title,
+            'font': {
+                'size': 16,
+                'color': '#333',
+                'family': 'Arial'
+            }
+        },
+        gauge={
+            'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': "#333"},
+            'bar': {'color': bar_color},
+            'bgcolor': "white",
+            'borderwidth': 2,
+            'bordercolor': "#333",
+            'steps': [
+                {'range': [0, 25], 'color': "#ffcccc"},
+                {'range': [25, 50], 'color': "#ffebcc"},
+                {'range': [50, 75], 'color': "#e6ffcc"},
+                {'range': [75, 100], 'color': "#ccffcc"}
+            ],
+        }
+    ))
+
+    # Layout adjustments for better contrast
+    fig.update_layout(
+        height=height,
+        margin=dict(t=50, b=30, l=30, r=30),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white')  # Ensures all text is white by default
+    )
+
+    return fig
+
+
+# Build comparison chart from scratch
+def build_comparison_chart(values, titles, colors):
+    fig = go.Figure()
+
+    for i, (value, title, color) in enumerate(zip(values, titles, colors)):
+        fig.add_trace(go.Bar(
+            x=[title],
+            y=[value],
+            name=title,
+            marker_color=color,
+            text=f"{value:.1f}%",
+            textposition='auto',
+            textfont=dict(color='white', size=14)  # White text on bars
+        ))
+
+    fig.update_layout(
+        title={
+            'text': "Model Comparison",
+            'font': {
+                'size': 18,
+                'color': 'white'  # White title
+            }
+        },
+        height=400,
+        yaxis=dict(
+            range=[0, 100],
+            title=dict(
+                text="Hit Rate (%)",
+                font=dict(color='white')
+            ),
+            tickfont=dict(color='white')   # <— y‑axis tick labels
+    ),
+    xaxis=dict(
+        tickfont=dict(color='white')   # <— x‑axis tick labels
+    ),
+        legend=dict(
+            font=dict(color='white')  # White legend text
+        ),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+    )
+
+    return fig
+
+
+# Build radar chart for model impact from scratch
+def build_radar_chart(values, titles):
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatterpolar(
+        r=values,
+        theta=titles,
+        fill='toself',
+        fillcolor='rgba(76, 175, 80, 0.3)',
+        line=dict(color='rgb(76, 175, 80)', width=2),
+        name="Model Impact"
+    ))
+
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 100]
+            ),
+            angularaxis=dict(
+                tickfont=dict(size=12),
+            )
+        ),
+        showlegend=False,
+        height=400,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+    )
+
+    return fig
+
+
+# Build weighted vs theoretical maximum chart from scratch
+def build_comparison_bar(weighted_value, unweighted_value):
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        x=['Weighted Prediction'],
+        y=[weighted_value],
+        name='Weighted Prediction',
+        marker_color='#673ab7',
+        text=[f'{weighted_value:.1f}%'],
+        textposition='auto'
+    ))
+
+    fig.add_trace(go.Bar(
+        x=['Theoretical Maximum'],
+        y=[unweighted_value],
+        name='Potential Maximum',
+        marker_color='#9575cd',
+        text=[f'{unweighted_value:.1f}%'],
+        textposition='auto'
+    ))
+
+    fig.update_layout(
+        title=dict(
+            text="Weighted vs Theoretical Maximum Comparison",
+            font=dict(color='white', size=16)
+    ),
+    yaxis=dict(
+        range=[0, 100],
+        title=dict(
+            text="Prediction Percentage",
+            font=dict(color='white')
+        ),
+        tickfont=dict(color='white')
+    ),
+    xaxis=dict(
+        tickfont=dict(color='white')
+    ),
+    legend=dict(
+        font=dict(color='white')
+    ),
+    paper_bgcolor='rgba(0,0,0,0)',
+    plot_bgcolor='rgba(0,0,0,0)',
+    height=400
+)
+    return fig
+
+
+# Build a ranked horizontal bar chart of feature contributions (in score
+# points, largest magnitude at the top) from scratch
+def build_contribution_chart(names, values, base, height=300):
+    fig = go.Figure(go.Bar(
+        x=list(values),
+        y=list(names),
+        orientation='h',
+        marker_color=[contribution_color(value) for value in values],
+        text=[f"{value:+.1f}" for value in values],
+        textposition='auto',
+        textfont=dict(color='white'),
+        hovertemplate="%{y}<br>%{x:+.2f} points<extra></extra>",
+    ))
+
+    fig.update_layout(
+        title=dict(text=f"Feature Contributions (base {base:.1f}%)", font=dict(color='white', size=14)),
+        height=height,
+        margin=dict(t=40, b=20, l=10, r=10),
+        xaxis=dict(title=dict(text="Score points", font=dict(color='white')), tickfont=dict(color='white'),
+                   zeroline=True, zerolinecolor='white'),
+        yaxis=dict(autorange="reversed", tickfont=dict(color='white'), automargin=True),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+    )
+    return fig
+
+
+# Line chart of scores over time, one trace per column of history, with
+# dashed lines at the recommendation band boundaries
+def build_history_chart(history, x, columns, colors, title):
+    fig = go.Figure()
+    for column, color in zip(columns, colors):
+        fig.add_trace(go.Scatter(
+            x=history[x],
+            y=history[column],
+            name=column,
+            mode='lines+markers',
+            line=dict(color=color, width=3 if column in ('Final Score', 'Mean Score') else 1.5),
+            hovertemplate=f"{column} %{{y:.1f}}%<extra></extra>",
+        ))
+    for lower, _, color in recommendation_bands[:-1]:
+        fig.add_hline(y=lower, line=dict(color=color, dash='dash', width=1))
+
+    fig.update_layout(
+        title=dict(text=title, font=dict(color='white', size=16)),
+        height=400,
+        yaxis=dict(range=[0, 100], title=dict(text="Score (%)", font=dict(color='white')),
+                   tickfont=dict(color='white')),
+        xaxis=dict(tickfont=dict(color='white')),
+        legend=dict(font=dict(color='white')),
+        hovermode='x unified',
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+    )
+    return fig
+
+
+# Stepped 0-100 colorscale with the recommendation band colors
+def band_colorscale():
+    scale = []
+    upper = 100
+    for lower, _, color in recommendation_bands:
+        scale = [[lower / 100, color], [upper / 100, color]] + scale
+        upper = lower
+    return scale
+
+
+# Module x style heatmap of final scores as a single Heatmap trace.
+# final and styles are the grids returned by scoring.module_style_grid().
+def create_score_heatmap(final, styles):
+    modules = [str(module).upper() for module in final.index]
+    labelled = final.size <= MAX_LABELLED_CELLS
+    fig = go.Figure(go.Heatmap(
+        z=final.to_numpy(),
+        x=[f"Style {slot + 1}" for slot in range(final.shape[1])],
+        y=modules,
+        customdata=np.char.upper(styles.to_numpy().astype(str)),
+        zmin=0,
+        zmax=100,
+        colorscale=band_colorscale(),
+        xgap=1,
+        ygap=1,
+        texttemplate="%{z:.0f}" if labelled else None,
+        hovertemplate="Module %{y}<br>Style %{customdata}<br>Final Score %{z:.1f}%<extra></extra>",
+        colorbar=dict(title="Final Score", ticksuffix="%", tickvals=[0, 50, 70, 85, 100]),
+    ))
+    fig.update_layout(
+        title="Final Score by Module and Style",
+        height=max(400, min(1200, 22 * len(modules) + 150)),
+        yaxis=dict(autorange="reversed"),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color="white"),
+        margin=dict(l=20, r=20, t=60, b=20),
+    )
+    return fig
+
+
+# Module x recommendation band heatmap of style counts, for overviews too
+# large to draw cell by cell. summary is scoring.module_summary() output.
+def create_band_heatmap(summary):
+    bands = [column for column in summary.columns if '-' in column]
+    counts = summary[bands].to_numpy()
+    fig = go.Figure(go.Heatmap(
+        z=counts,
+        x=bands,
+        y=[str(module).upper() for module in summary['Module Number']],
+        colorscale="Reds",
+        texttemplate="%{z}",
+        hovertemplate="Module %{y}<br>Band %{x}<br>%{z} styles<extra></extra>",
+        colorbar=dict(title="Styles"),
+    ))
+    fig.update_layout(
+        title="Styles per Recommendation Band",
+        height=max(400, min(1200, 22 * len(summary) + 150)),
+        yaxis=dict(autorange="reversed"),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color="white"),
+        margin=dict(l=20, r=20, t=60, b=20),
+    )
+    return fig
+
+
+# Gauge bar color for a score
+def gauge_color(value):
+    if value < 50:
+        return "firebrick"
+    elif value < 75:
+        return "orange"
+    return "forestgreen"
+
+
+# Bar color of a contribution: green raises the score, red lowers it
+def contribution_color(value):
+    return "forestgreen" if value >= 0 else "firebrick"
+
+
+# Figure dict without the theme defaults for trace types the figure does not use
+def _slim_figure_dict(fig):
+    figure = fig.to_dict()
+    template = figure.get('layout', {}).get('template')
+    if template and 'data' in template:
+        used = {trace.get('type') for trace in figure['data']}
+        template['data'] = {kind: value for kind, value in template['data'].items() if kind in used}
+    return figure
+
+
+# Figure from a patched template dict, skipping validation
+def _from_template(template, patch):
+    figure = copy.deepcopy(template)
+    patch(figure)
+    return go.Figure(figure, _validate=False)
+
+
+@lru_cache(maxsize=None)
+def _gauge_template(title, height):
+    return _slim_figure_dict(build_gauge_chart(0, title, height=height))
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def _gauge_figure(value, title, height):
+    def patch(figure):
+        figure['data'][0]['value'] = value
+        figure['data'][0]['gauge']['bar']['color'] = gauge_color(value)
+    return _from_template(_gauge_template(title, height), patch)
+
+
+# Gauge chart of a 0-100 score (cached by the value shown, to 0.1)
+def create_gauge_chart(value, title, color="darkblue", height=300):
+    return _gauge_figure(round(float(value), 1), title, height)
+
+
+@lru_cache(maxsize=None)
+def _comparison_template(titles, colors):
+    return _slim_figure_dict(build_comparison_chart([0] * len(titles), titles, colors))
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def _comparison_figure(values, titles, colors):
+    def patch(figure):
+        for trace, value in zip(figure['data'], values):
+            trace['y'] = [value]
+            trace['text'] = f"{value:.1f}%"
+    return _from_template(_comparison_template(titles, colors), patch)
+
+
+# Model comparison bar chart
+def create_comparison_chart(values, titles, colors):
+    return _comparison_figure(tuple(round(float(v), 1) for v in values), tuple(titles), tuple(colors))
+
+
+@lru_cache(maxsize=None)
+def _radar_template(titles):
+    return _slim_figure_dict(build_radar_chart([0] * len(titles), list(titles)))
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def _radar_figure(values, titles):
+    def patch(figure):
+        figure['data'][0]['r'] = list(values)
+    return _from_template(_radar_template(titles), patch)
+
+
+# Radar chart of model impacts
+def create_radar_chart(values, titles):
+    return _radar_figure(tuple(round(float(v), 1) for v in values), tuple(titles))
+
+
+@lru_cache(maxsize=None)
+def _comparison_bar_template():
+    return _slim_figure_dict(build_comparison_bar(0, 0))
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def _comparison_bar_figure(weighted_value, unweighted_value):
+    def patch(figure):
+        for trace, value in zip(figure['data'], [weighted_value, unweighted_value]):
+            trace['y'] = [value]
+            trace['text'] = [f'{value:.1f}%']
+    return _from_template(_comparison_bar_template(), patch)
+
+
+# Weighted prediction vs theoretical maximum bar chart
+def create_comparison_bar(weighted_value, unweighted_value):
+    return _comparison_bar_figure(round(float(weighted_value), 1), round(float(unweighted_value), 1))
+
+
+@lru_cache(maxsize=None)
+def _contribution_template(count, height):
+    return _slim_figure_dict(build_contribution_chart([""] * count, [0.0] * count, 0.0, height))
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def _contribution_figure(names, values, base, height):
+    def patch(figure):
+        trace = figure['data'][0]
+        trace['x'] = list(values)
+        trace['y'] = list(names)
+        trace['marker']['color'] = [contribution_color(value) for value in values]
+        trace['text'] = [f"{value:+.1f}" for value in values]
+        figure['layout']['title']['text'] = f"Feature Contributions (base {base:.1f}%)"
+    return _from_template(_contribution_template(len(names), height), patch)
+
+
+# Ranked feature contribution bar chart (names and values in display order)
+def create_contribution_chart(names, values, base, height=300):
+    return _contribution_figure(tuple(str(name) for name in names), tuple(round(float(v), 2) for v in values),
+                                round(float(base), 1), height)
+
+
+# Semicircle gauge drawn with CSS, for the lite render mode
+def gauge_html(value, height=300):
+    size = max(120, min(240, height - 100))
+    ring = size // 7
+    angle = max(0.0, min(100.0, value)) * 1.8
+    return f"""
+    <div style="text-align: center; padding: 10px 0;">
+        <div style="position: relative; width: {size}px; height: {size // 2}px; margin: auto; overflow: hidden;">
+            <div style="width: {size}px; height: {size}px; border-radius: 50%;
+                background: conic-gradient(from 270deg, {gauge_color(value)} 0deg {angle:.1f}deg,
+                rgba(255, 255, 255, 0.85) {angle:.1f}deg 180deg, transparent 180deg);"></div>
+            <div style="position: absolute; left: {ring}px; top: {ring}px; width: {size - 2 * ring}px;
+                height: {size - 2 * ring}px; border-radius: 50%; background: rgb(38, 72, 160);"></div>
+        </div>
+        <div style="color: white; font-family: 'Arial Black'; font-size: 28px; margin-top: -34px;
+            position: relative;">{value:.1f}%</div>
+    </div>
+    """
+
+
+# Horizontal percentage bars, for the lite render mode
+def bars_html(values, titles, colors, title=""):
+    rows = "".join(f"""
+        <div style="margin: 6px 0;">
+            <div style="color: white; font-weight: bold;">{label}: {value:.1f}%</div>
+            <div style="background: rgba(255, 255, 255, 0.25); border-radius: 4px; height: 14px;">
+                <div style="background: {color}; width: {max(0.0, min(100.0, value)):.1f}%; height: 14px;
+                    border-radius: 4px;"></div>
+            </div>
+        </div>""" for value, label, color in zip(values, titles, colors))
+    heading = f'<div class="chart-title">{title}</div>' if title else ""
+    return f'<div style="padding: 10px 0;">{heading}{rows}</div>'
+
+
+# Diverging contribution bars around a center line, for the lite render mode
+def contributions_html(names, values, base):
+    scale = max([abs(value) for value in values] + [1e-9])
+    rows = "".join(f"""
+        <div style="margin: 4px 0;">
+            <div style="color: white; font-size: 0.85rem;">{name}: {value:+.1f}</div>
+            <div style="display: flex; height: 10px; background: rgba(255, 255, 255, 0.15); border-radius: 4px;">
+                <div style="width: 50%; display: flex; justify-content: flex-end;">
+                    <div style="background: {contribution_color(value)};
+                        width: {100 * max(0.0, -value) / scale:.1f}%;"></div>
+                </div>
+                <div style="width: 50%;">
+                    <div style="background: {contribution_color(value)}; height: 10px;
+                        width: {100 * max(0.0, value) / scale:.1f}%;"></div>
+                </div>
+            </div>
+        </div>""" for name, value in zip(names, values))
+    return (f'<div style="padding: 10px 0;"><div class="chart-title">Feature Contributions '
+            f'(base {base:.1f}%)</div>{rows}</div>')
+
+
+# Print JSON payload size and build time for each render path
+def main():
+    import importlib
+
+    import plotly.io as pio
+    try:
+        # Register Streamlit's Plotly theme, as the dashboard does
+        importlib.import_module('streamlit.elements.plotly_chart')
+    except ImportError:
+        pass
+
+    def measure(build, repeat=50):
+        build()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = build()
+        elapsed = (time.perf_counter() - start) / repeat * 1000
+        size = len(result if isinstance(result, str) else pio.to_json(result, validate=False))
+        return elapsed, size
+
+    values = [iter(range(100000)), iter(range(100000))]
+
+    def next_value(i=0):
+        return next(values[i]) % 1000 / 10
+
+    cases = [
+        ("gauge", lambda: build_gauge_chart(next_value(), ""),
+         lambda: create_gauge_chart(next_value(1), ""), lambda: create_gauge_chart(42.0, ""),
+         lambda: gauge_html(42.0)),
+        ("comparison", lambda: build_comparison_chart([next_value(), 60, 70], ["A", "B", "C"], ["red", "green", "blue"]),
+         lambda: create_comparison_chart([next_value(1), 60, 70], ["A", "B", "C"], ["red", "green", "blue"]),
+         lambda: create_comparison_chart([42, 60, 70], ["A", "B", "C"], ["red", "green", "blue"]),
+         lambda: bars_html([42, 60, 70], ["A", "B", "C"], ["red", "green", "blue"])),
+        ("radar", lambda: build_radar_chart([next_value(), 20, 30], ["A", "B", "C"]),
+         lambda: create_radar_chart([next_value(1), 20, 30], ["A", "B", "C"]),
+         lambda: create_radar_chart([42, 20, 30], ["A", "B", "C"]), None),
+        ("weighted bar", lambda: build_comparison_bar(next_value(), 80),
+         lambda: create_comparison_bar(next_value(1), 80), lambda: create_comparison_bar(42, 80),
+         lambda: bars_html([42, 80], ["Weighted", "Maximum"], ["#673ab7", "#9575cd"])),
+        ("contributions", lambda: build_contribution_chart(["A", "B", "C"], [next_value(), -5, 2], 40),
+         lambda: create_contribution_chart(["A", "B", "C"], [next_value(1), -5, 2], 40),
+         lambda: create_contribution_chart(["A", "B", "C"], [42, -5, 2], 40),
+         lambda: contributions_html(["A", "B", "C"], [42, -5, 2], 40)),
+    ]
+    print(f"{'chart':<14}{'from scratch':>22}{'patched template':>22}{'cached':>22}{'lite html':>22}")
+    for name, *builders in cases:
+        cells = []
+        for build in builders:
+            if build is None:
+                cells.append(f"{'-':>22}")
+                continue
+            elapsed, size = measure(build)
+            cells.append(f"{elapsed:8.2f} ms {size:7,} B")
+        print(f"{name:<14}" + "".join(f"{cell:>22}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Convert Excel trackers to Parquet for fast uploads and bulk scoring.
+
+    python convert.py tracker.xlsx                  # writes tracker.parquet
+    python convert.py trackers/*.xlsx --out-dir parquet/
+    python convert.py tracker.xlsx --model-columns  # keep only the scored columns
+
+Parquet keeps column types and is read column by column, so the dashboard
+and bulk_score.py load only the Module/Style and model feature columns in
+a fraction of the time pd.read_excel takes for the same rows.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+from scoring import read_table, required_columns, table_type
+
+
+# Make object columns holding mixed Python types (e.g. numbers and text in
+# the same Excel column) storable in Parquet by writing them as text
+def _arrow_safe(df):
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True).startswith('mixed'):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    df.columns = [str(col) for col in df.columns]
+    return df
+
+
+# Convert one Excel/CSV file to Parquet, keeping only columns (matched and
+# renamed as when scoring) if given; returns the row count
+def convert_file(path, out_path, columns=None):
+    df = read_table(path, table_type(path), columns)
+    _arrow_safe(df).to_parquet(out_path, index=False)
+    return len(df)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert Excel trackers to Parquet")
+    parser.add_argument('inputs', nargs='+', help="Input .xlsx, .xls or .csv files")
+    parser.add_argument('--out-dir', help="Directory for the .parquet files (default: next to each input)")
+    parser.add_argument('--model-columns', action='store_true',
+                        help="Keep only the Module/Style and model feature columns")
+    args = parser.parse_args(argv)
+
+    columns = required_columns() if args.model_columns else None
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+    for path in args.inputs:
+        out_dir = args.out_dir or os.path.dirname(path)
+        out_path = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + '.parquet')
+        start = time.perf_counter()
+        rows = convert_file(path, out_path, columns)
+        print(f"{path} -> {out_path}: {rows} rows in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Memory-bounded store of uploaded data shared by all dashboard sessions.
+
+Parsed uploads (and the batch scores computed from them) are keyed by the
+SHA-256 of the file content, so sessions that upload the same file share one
+copy and each session's own state only holds keys. Every entry records which
+sessions reference it; a reference lapses when its session has not used the
+entry for the session TTL (Streamlit gives no hook for closed tabs). When the
+total estimated size exceeds the cap, entries are evicted least recently used
+first, unreferenced ones before referenced ones. Evicting a referenced entry
+is safe: the session still has its upload and reloads the entry on next use.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+# Estimated bytes held by obj, counting objects shared within it once
+def estimate_size(obj, seen=None):
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if hasattr(obj, 'memory_usage') and hasattr(obj, 'index'):
+        # DataFrame or Series
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    if hasattr(obj, 'nbytes') and hasattr(obj, 'dtype'):
+        # NumPy array
+        return int(obj.nbytes)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(key, seen) + estimate_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += estimate_size(vars(obj), seen)
+    return size
+
+
+class _Entry:
+    def __init__(self, value, nbytes):
+        self.value = value
+        self.nbytes = nbytes
+        self.refs = {}
+
+
+class SharedStore:
+    def __init__(self, max_bytes=2 ** 30, session_ttl=3600):
+        self.max_bytes = max_bytes
+        self.session_ttl = session_ttl
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    # Value stored under key, or None; session (if given) now references it
+    def get(self, key, session=None):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            if session is not None:
+                entry.refs[session] = now
+            self.hits += 1
+            return entry.value
+
+    # Store value under key, referenced by session, then evict down to the cap
+    def put(self, key, value, session=None):
+        nbytes = estimate_size(value)
+        now = time.time()
+        with self._lock:
+            old = self._entries.pop(key, None)
+            entry = _Entry(value, nbytes)
+            if old is not None:
+                self._bytes -= old.nbytes
+                entry.refs = old.refs
+            if session is not None:
+                entry.refs[session] = now
+            self._entries[key] = entry
+            self._bytes += nbytes
+            self._evict(now, keep=key)
+        return value
+
+    # Value under key, calling loader() to create it if absent. Concurrent
+    # sessions asking for the same missing key wait for a single load.
+    def get_or_load(self, key, session, loader):
+        value = self.get(key, session)
+        if value is not None:
+            return value
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                value = self.get(key, session)
+                if value is None:
+                    value = self.put(key, loader(), session)
+                    with self._lock:
+                        self.loads += 1
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+        return value
+
+    # Drop session's reference to key
+    def release(self, key, session):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.refs.pop(session, None)
+            self._evict(time.time())
+
+    # Drop every reference session holds
+    def release_session(self, session):
+        with self._lock:
+            for entry in self._entries.values():
+                entry.refs.pop(session, None)
+            self._evict(time.time())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # Estimated bytes of the entries session references
+    def session_bytes(self, session):
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values() if session in entry.refs)
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            self._expire_refs(now)
+            sessions = set()
+            for entry in self._entries.values():
+                sessions.update(entry.refs)
+            return {
+                'entries': len(self._entries),
+                'referenced': sum(1 for entry in self._entries.values() if entry.refs),
+                'sessions': len(sessions),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'loads': self.loads,
+                'evictions': self.evictions,
+            }
+
+    # Forget references of sessions idle for longer than the session TTL
+    def _expire_refs(self, now):
+        cutoff = now - self.session_ttl
+        for entry in self._entries.values():
+            for session in [s for s, seen in entry.refs.items() if seen < cutoff]:
+                del entry.refs[session]
+
+    # Evict least recently used entries, unreferenced first, until the store
+    # fits its cap; keep (the entry just stored) is never evicted
+    def _evict(self, now, keep=None):
+        if self._bytes <= self.max_bytes:
+            return
+        self._expire_refs(now)
+        for referenced in (False, True):
+            for key in [k for k, entry in self._entries.items() if bool(entry.refs) == referenced and k != keep]:
+                if self._bytes <= self.max_bytes:
+                    return
+                self._bytes -= self._entries.pop(key).nbytes
+                self.evictions += 1
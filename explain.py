@@ -0,0 +1,51 @@
+"""Per-row feature contributions of the three models.
+
+Critical Path is linear, so a feature's contribution is exactly its
+coefficient times its value, on top of the intercept. For the Historia and
+Talento forests, each split a row passes on its way down a tree credits the
+change in the node's probability to the split feature (tree-path
+contributions), averaged over the trees. Every root-to-node path sum is
+precomputed once per forest, so explaining a batch is a single pass over
+its leaves, the same work as a flat forest prediction. In both cases the
+base value plus a row's contributions equals the row's score.
+"""
+import numpy as np
+import pandas as pd
+
+from scoring import FOREST_MODELS, MODEL_FEATURES, get_flat_forest, get_model
+
+# Contributions shown per model in the dashboard chart
+TOP_FEATURES = 8
+
+
+# Contributions of each feature of every row of df to the model's 0-100
+# score. Returns (base, contributions): base is an array with one value per
+# row and contributions a frame aligned with df with one column per feature.
+def contributions(name, df, model=None):
+    features = MODEL_FEATURES[name]
+    X = df[features]
+    if name in FOREST_MODELS:
+        if model is not None:
+            from forest import FlatForest
+            forest = FlatForest.from_pipeline(model)
+        else:
+            forest = get_flat_forest(name)
+        base, values, columns = forest.contributions(X)
+        values = pd.DataFrame(values * 100, index=df.index, columns=columns)[features]
+        return base * 100, values
+
+    from whatif import linear_terms
+    model = model if model is not None else get_model(name)
+    terms = linear_terms(model)
+    if terms is None:
+        raise ValueError(f"{name} is not a linear model; its contributions cannot be computed")
+    coef, intercept = terms
+    values = X.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float) * coef
+    return np.full(len(df), intercept), pd.DataFrame(values, index=df.index, columns=features)
+
+
+# The largest contributions of one row (a Series of contributions by
+# feature), largest magnitude first
+def top_contributions(row_contributions, limit=TOP_FEATURES):
+    order = row_contributions.abs().sort_values(ascending=False, kind='stable').index
+    return row_contributions[order[:limit]]
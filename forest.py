@@ -0,0 +1,303 @@
+"""Flattened NumPy inference for the random forest pipelines.
+
+    python forest.py --rows 100000
+
+FlatForest copies every tree of a fitted RandomForestClassifier into flat
+node arrays, with the two children of a node stored next to each other, and
+evaluates all trees for all rows together, one tree level per step.
+StandardScaler / OneHotEncoder column transformers are evaluated directly in
+NumPy as well; any other preprocessing falls back to scikit-learn.
+
+Inputs are cast to float32 and compared with the float64 thresholds, and the
+per-tree probabilities are summed in estimator order, exactly as
+scikit-learn does, so the probabilities match predict_proba bit for bit.
+The flat path removes scikit-learn's per-call overhead for small batches;
+for large batches scikit-learn's compiled traversal is faster (see the
+benchmark), which is why scoring only uses it up to FLAT_MAX_ROWS rows.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+# Node array files written by FlatForest.save()
+ARRAY_NAMES = ['roots', 'children', 'feature', 'threshold', 'proba']
+
+# Rows evaluated per block, bounding the (trees x rows) working arrays
+BLOCK_ROWS = 4096
+
+
+# Column-wise StandardScaler / OneHotEncoder transform evaluated in NumPy.
+# Returns None when the preprocessing steps use anything else; the compiled
+# transform itself returns None for inputs it cannot reproduce exactly.
+def compile_preprocessor(steps):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    if len(steps) != 1 or not isinstance(steps[0], ColumnTransformer):
+        return None
+    column_transformer = steps[0]
+    if column_transformer.remainder != 'drop':
+        return None
+
+    blocks = []
+    for _, transformer, columns in column_transformer.transformers_:
+        if transformer == 'drop' or len(columns) == 0:
+            continue
+        if isinstance(transformer, Pipeline):
+            if len(transformer.steps) != 1:
+                return None
+            transformer = transformer.steps[0][1]
+        if isinstance(transformer, StandardScaler):
+            blocks.append(('scale', list(columns), transformer))
+        elif (isinstance(transformer, OneHotEncoder) and transformer.drop is None
+              and transformer.handle_unknown == 'ignore'
+              and transformer.min_frequency is None and transformer.max_categories is None):
+            blocks.append(('onehot', list(columns), transformer))
+        else:
+            return None
+
+    def transform(df):
+        parts = []
+        for kind, columns, transformer in blocks:
+            if kind == 'scale':
+                # scikit-learn keeps float32/float16 inputs in their own precision
+                if any(dtype.kind == 'f' and dtype != np.float64 for dtype in df[columns].dtypes):
+                    return None
+                X = df[columns].to_numpy(dtype=np.float64, copy=True)
+                if transformer.with_mean:
+                    X -= transformer.mean_
+                if transformer.with_std:
+                    X /= transformer.scale_
+                parts.append(X)
+            else:
+                for column, categories in zip(columns, transformer.categories_):
+                    values = df[column].to_numpy(dtype=object)
+                    parts.append((values[:, np.newaxis] == categories[np.newaxis, :]).astype(np.float64))
+        return np.hstack(parts)
+
+    return transform
+
+
+class FlatForest:
+    def __init__(self, pipeline, roots, children, feature, threshold, proba, depth):
+        self.pipeline = pipeline
+        self.preprocessor = preprocessing_steps(pipeline)
+        self.roots = roots
+        self.children = children
+        self.feature = feature
+        self.threshold = threshold
+        self.proba = proba
+        self.depth = depth
+        self._compiled = compile_preprocessor(self.preprocessor)
+        self._paths = None
+
+    # Flatten a fitted Pipeline whose last step is a RandomForestClassifier
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        forest = pipeline.steps[-1][1]
+        roots, children, feature, threshold, proba = [], [], [], [], []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            left, right = tree.children_left, tree.children_right
+
+            # Breadth-first order puts the two children of every node side by side
+            order = [0]
+            for node in order:
+                if left[node] != -1:
+                    order.extend([left[node], right[node]])
+            order = np.asarray(order)
+            position = np.empty(tree.node_count, dtype=np.intp)
+            position[order] = np.arange(tree.node_count)
+            is_leaf = left[order] == -1
+
+            # A node moves to children[node] + (x > threshold). Leaves point at
+            # themselves with an infinite threshold so extra steps leave them in place.
+            roots.append(offset)
+            children.append(np.where(is_leaf, np.arange(tree.node_count), position[left[order]]) + offset)
+            feature.append(np.where(is_leaf, 0, tree.feature[order]))
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold[order]))
+
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            value = tree.value[order, 0, :forest.n_classes_]
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba.append(value / normalizer)
+            offset += tree.node_count
+
+        depth = max(estimator.tree_.max_depth for estimator in forest.estimators_)
+        return cls(
+            pipeline, np.asarray(roots, dtype=np.intp),
+            np.concatenate(children).astype(np.intp), np.concatenate(feature).astype(np.intp),
+            np.concatenate(threshold), np.concatenate(proba), depth
+        )
+
+    # Write the node arrays as .npy files that load() can memory-map
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        np.save(os.path.join(path, "depth.npy"), np.asarray(self.depth))
+
+    @classmethod
+    def load(cls, path, pipeline, mmap_mode='r'):
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in ARRAY_NAMES}
+        depth = int(np.load(os.path.join(path, "depth.npy")))
+        return cls(pipeline, depth=depth, **arrays)
+
+    # Leaf node of every tree (rows) for every sample (columns)
+    def apply(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_rows) * n_features)[np.newaxis, :]
+        nodes = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)
+        for _ in range(self.depth):
+            values = flat_X[row_offsets + self.feature[nodes]]
+            nodes = self.children[nodes] + (values > self.threshold[nodes])
+        return nodes
+
+    # Class probabilities for already preprocessed features
+    def predict_proba_transformed(self, X):
+        out = np.empty((X.shape[0], self.proba.shape[1]))
+        for start in range(0, X.shape[0], BLOCK_ROWS):
+            leaves = self.apply(X[start:start + BLOCK_ROWS])
+            total = np.zeros((leaves.shape[1], self.proba.shape[1]))
+            for tree_leaves in leaves:
+                total += self.proba[tree_leaves]
+            out[start:start + BLOCK_ROWS] = total / len(self.roots)
+        return out
+
+    # Contributions to the class-1 probability accumulated from the root of
+    # its tree down to every node: each split on the way adds the change in
+    # node probability to the split's feature. Built once per feature count.
+    def path_contributions(self, n_features):
+        if self._paths is not None and self._paths.shape[1] == n_features:
+            return self._paths
+        positive = self.proba[:, 1]
+        paths = np.zeros((len(self.children), n_features))
+        nodes = np.asarray(self.roots)
+        for _ in range(self.depth):
+            nodes = nodes[np.isfinite(self.threshold[nodes])]
+            left = self.children[nodes]
+            for children in (left, left + 1):
+                paths[children] = paths[nodes]
+                paths[children, self.feature[nodes]] += positive[children] - positive[nodes]
+            nodes = np.concatenate([left, left + 1])
+        self._paths = paths
+        return paths
+
+    # Tree-path contributions to the class-1 probability for already
+    # preprocessed features, found with one pass over the leaves as in
+    # predict_proba. Returns (bias, contributions); bias is the mean root
+    # probability, and it plus a row's contributions is the row's predicted
+    # probability.
+    def contributions_transformed(self, X):
+        paths = self.path_contributions(X.shape[1])
+        out = np.empty(X.shape)
+        for start in range(0, X.shape[0], BLOCK_ROWS):
+            leaves = self.apply(X[start:start + BLOCK_ROWS])
+            total = np.zeros((leaves.shape[1], X.shape[1]))
+            for tree_leaves in leaves:
+                total += paths[tree_leaves]
+            out[start:start + BLOCK_ROWS] = total / len(self.roots)
+        return np.full(X.shape[0], np.mean(self.proba[self.roots, 1])), out
+
+    # Input column behind each preprocessed feature (one-hot columns map to
+    # the column they encode)
+    def source_columns(self):
+        inputs = list(self.pipeline.feature_names_in_)
+        names = list(self.preprocessor[-1].get_feature_names_out()) if self.preprocessor else inputs
+        columns = []
+        for name in names:
+            name = str(name).split('__', 1)[-1]
+            matches = [col for col in inputs if name == col or name.startswith(col + '_')]
+            if not matches:
+                raise ValueError(f"Cannot map feature {name!r} to an input column")
+            columns.append(max(matches, key=len))
+        return columns
+
+    # Tree-path contributions of each input column of df to the class-1
+    # probability; returns (bias, contributions, column names). Rows with
+    # missing values get NaN contributions.
+    def contributions(self, df):
+        X = self.transform(df)
+        bias, values = self.contributions_transformed(X)
+        inputs = list(self.pipeline.feature_names_in_)
+        mapping = np.zeros((X.shape[1], len(inputs)))
+        mapping[np.arange(X.shape[1]), [inputs.index(col) for col in self.source_columns()]] = 1
+        values = values @ mapping
+        values[np.isnan(X).any(axis=1)] = np.nan
+        return bias, values, inputs
+
+    def transform(self, df):
+        if self._compiled is not None:
+            X = self._compiled(df)
+            if X is not None:
+                return X
+        X = df
+        for step in self.preprocessor:
+            X = step.transform(X)
+        return X.toarray() if hasattr(X, 'toarray') else np.asarray(X, dtype=np.float64)
+
+    # Same result as pipeline.predict_proba(df)
+    def predict_proba(self, df):
+        X = self.transform(df)
+        if np.isnan(X).any():
+            # Missing values follow scikit-learn's own handling (or errors)
+            return self.pipeline.predict_proba(df)
+        return self.predict_proba_transformed(X)
+
+
+# Fitted steps that run at predict time (resamplers such as SMOTE are skipped)
+def preprocessing_steps(pipeline):
+    return [step for _, step in pipeline.steps[:-1]
+            if step not in (None, 'passthrough') and not hasattr(step, 'fit_resample')]
+
+
+# Time stock predict_proba against FlatForest for 1 row and many rows
+def benchmark(name, rows=100000, repeat=200):
+    from scoring import MODEL_FEATURES, get_model, normalize_keys
+    from synthetic import make_frame
+
+    pipeline = get_model(name)
+    flat = FlatForest.from_pipeline(pipeline)
+    df = normalize_keys(make_frame(rows))[MODEL_FEATURES[name]]
+
+    exact = True
+    print(f"{name}: {len(flat.roots)} trees, depth {flat.depth}, "
+          f"{'compiled' if flat._compiled else 'scikit-learn'} preprocessing")
+    for n_rows in [1, 100, rows]:
+        sample = df.iloc[:n_rows]
+        timings = {}
+        for label, predict in [("sklearn", pipeline.predict_proba), ("flat", flat.predict_proba)]:
+            predict(sample)
+            runs = repeat if n_rows <= 100 else 3
+            start = time.perf_counter()
+            for _ in range(runs):
+                proba = predict(sample)
+            timings[label] = ((time.perf_counter() - start) / runs, proba)
+        exact = exact and np.array_equal(timings["sklearn"][1], timings["flat"][1])
+        sk, fl = timings["sklearn"][0], timings["flat"][0]
+        print(f"  {n_rows:>7,} rows: sklearn {sk * 1000:9.2f} ms ({n_rows / sk:11,.0f} rows/s) | "
+              f"flat {fl * 1000:9.2f} ms ({n_rows / fl:11,.0f} rows/s) | {sk / fl:5.2f}x")
+    print(f"  exact match: {exact}")
+    return exact
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the flattened forest backend")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=200, help="Repetitions for 1- and 100-row timings")
+    args = parser.parse_args()
+
+    for name in ["Historia", "Talento"]:
+        benchmark(name, args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
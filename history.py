@@ -0,0 +1,204 @@
+"""Persistent history of scored changeovers.
+
+Every scored row (module, style, feature values, the three raw model scores,
+the final score, the model versions and the time it was scored) is appended
+to a SQLite file. Feature values are stored as a JSON array per row, with
+the column names stored once per distinct feature set; values JSON has no
+type for (dates, timestamps) are stored as their string form. Batches go in
+as one transaction, and lookups by module, style and time range use the
+(module, style, scored_at) index, so a module's trajectory is read without
+scanning the rest of the history.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from scoring import KEY_COLUMNS, model_version, required_columns
+
+# Score columns of the history table, by model name
+SCORE_COLUMNS = {"Historia": "historia", "Critical Path": "critical_path", "Talento": "talento"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    scored_at REAL NOT NULL,
+    module TEXT NOT NULL,
+    style TEXT NOT NULL,
+    historia REAL,
+    critical_path REAL,
+    talento REAL,
+    final REAL NOT NULL,
+    historia_version TEXT,
+    critical_path_version TEXT,
+    talento_version TEXT,
+    source TEXT,
+    feature_set INTEGER REFERENCES feature_sets (id),
+    features TEXT
+);
+CREATE TABLE IF NOT EXISTS feature_sets (
+    id INTEGER PRIMARY KEY,
+    columns TEXT NOT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS scores_module_style_time ON scores (module, style, scored_at);
+CREATE INDEX IF NOT EXISTS scores_time ON scores (scored_at);
+"""
+
+
+class ScoreHistory:
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    # Append the scored rows of df (scores as returned by scoring.score) in
+    # one transaction; returns the number of rows added
+    def add(self, df, scores, source=None, scored_at=None):
+        # Rows that could not be scored have no final score to record
+        scores = scores[scores['Final Score'].notna()]
+        if len(scores) == 0:
+            return 0
+        scored_at = time.time() if scored_at is None else scored_at
+        features = [col for col in required_columns() if col not in KEY_COLUMNS and col in df.columns]
+        rows = df.loc[scores.index, features]
+        encode = json.JSONEncoder(check_circular=False, default=str).encode
+        feature_json = list(map(encode, zip(*(rows[col].tolist() for col in features))))
+
+        columns = {'scored_at': np.full(len(scores), scored_at)}
+        for col, name in zip(['module', 'style'], KEY_COLUMNS):
+            columns[col] = scores[name].astype(str).to_numpy()
+        for name, col in SCORE_COLUMNS.items():
+            if name in scores.columns:
+                columns[col] = scores[name].to_numpy(dtype=float)
+                columns[f"{col}_version"] = np.full(len(scores), model_version(name), dtype=object)
+            else:
+                columns[col] = np.full(len(scores), None, dtype=object)
+                columns[f"{col}_version"] = np.full(len(scores), None, dtype=object)
+        columns['final'] = scores['Final Score'].to_numpy(dtype=float)
+        columns['source'] = np.full(len(scores), source, dtype=object)
+        columns['features'] = np.asarray(feature_json, dtype=object)
+
+        # SQLite stores NaN scores as NULL
+        names = list(columns) + ['feature_set']
+        with self._lock:
+            feature_set = self._feature_set(features)
+            rows = zip(*(np.asarray(values).tolist() for values in columns.values()), [feature_set] * len(scores))
+            self._db.executemany(
+                f"INSERT INTO scores ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})", rows
+            )
+            self._db.commit()
+        return len(scores)
+
+    # Scores of a module (and style, if given) scored between start and end
+    # (UTC datetimes or Unix times), oldest first; with features=True the
+    # stored feature values are added as columns
+    def query(self, module, style=None, start=None, end=None, features=False):
+        sql = ("SELECT scored_at, module, style, historia, critical_path, talento, final"
+               + (", feature_set, features" if features else "") + " FROM scores WHERE module = ?")
+        params = [module]
+        if style is not None:
+            sql += " AND style = ?"
+            params.append(style)
+        sql, params = self._time_range(sql, params, start, end)
+        with self._lock:
+            result = pd.read_sql_query(sql + " ORDER BY scored_at", self._db, params=params)
+            sets = dict(self._db.execute("SELECT id, columns FROM feature_sets")) if features else {}
+        if features:
+            sets = {key: json.loads(columns) for key, columns in sets.items()}
+            values = [dict(zip(sets.get(key, []), json.loads(row))) if row else {}
+                      for key, row in zip(result.pop('feature_set'), result.pop('features'))]
+            result = result.join(pd.DataFrame(values, index=result.index))
+        return self._frame(result)
+
+    # Daily (UTC) mean, lowest and count of a module's final scores between start and end
+    def daily(self, module, start=None, end=None):
+        sql = ("SELECT date(scored_at, 'unixepoch') AS day, AVG(final) AS mean_final,"
+               " MIN(final) AS lowest_final, COUNT(*) AS scores FROM scores WHERE module = ?")
+        sql, params = self._time_range(sql, [module], start, end)
+        with self._lock:
+            result = pd.read_sql_query(sql + " GROUP BY day ORDER BY day", self._db, params=params)
+        result['day'] = pd.to_datetime(result['day'])
+        return result.rename(columns={'day': 'Day', 'mean_final': 'Mean Score', 'lowest_final': 'Lowest Score',
+                                      'scores': 'Scores'})
+
+    # Modules with any history, in order. Each step seeks the next module in
+    # the index, so this reads one index entry per module, not every row.
+    def modules(self):
+        sql = """
+            WITH RECURSIVE m(module) AS (
+                SELECT MIN(module) FROM scores
+                UNION ALL
+                SELECT (SELECT MIN(module) FROM scores WHERE module > m.module) FROM m WHERE m.module IS NOT NULL
+            )
+            SELECT module FROM m WHERE module IS NOT NULL
+        """
+        with self._lock:
+            return [row[0] for row in self._db.execute(sql)]
+
+    # Styles of a module with any history, in order (one index seek per style)
+    def styles(self, module):
+        sql = """
+            WITH RECURSIVE s(style) AS (
+                SELECT MIN(style) FROM scores WHERE module = :module
+                UNION ALL
+                SELECT (SELECT MIN(style) FROM scores WHERE module = :module AND style > s.style)
+                FROM s WHERE s.style IS NOT NULL
+            )
+            SELECT style FROM s WHERE style IS NOT NULL
+        """
+        with self._lock:
+            return [row[0] for row in self._db.execute(sql, {'module': module})]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # ID of a list of feature columns in feature_sets, added if new
+    def _feature_set(self, features):
+        columns = json.dumps(features)
+        row = self._db.execute("SELECT id FROM feature_sets WHERE columns = ?", (columns,)).fetchone()
+        if row is not None:
+            return row[0]
+        return self._db.execute("INSERT INTO feature_sets (columns) VALUES (?)", (columns,)).lastrowid
+
+    @staticmethod
+    def _time_range(sql, params, start, end):
+        if start is not None:
+            sql += " AND scored_at >= ?"
+            params.append(_timestamp(start))
+        if end is not None:
+            sql += " AND scored_at < ?"
+            params.append(_timestamp(end))
+        return sql, params
+
+    @staticmethod
+    def _frame(result):
+        result['scored_at'] = pd.to_datetime(result['scored_at'], unit='s', utc=True).dt.tz_convert(None)
+        for col in SCORE_COLUMNS.values():
+            # Columns of models that were never enabled come back as None
+            result[col] = result[col].astype(float)
+        names = {'scored_at': 'Scored At', 'module': 'Module Number', 'style': 'Style Number', 'final': 'Final Score'}
+        names.update({col: name for name, col in SCORE_COLUMNS.items()})
+        return result.rename(columns=names)
+
+
+# Unix time of a datetime, date or number
+def _timestamp(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    return pd.Timestamp(value).timestamp()
+
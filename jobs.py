@@ -0,0 +1,167 @@
+"""Background scoring jobs.
+
+Work submitted to a JobManager runs on a small thread pool instead of inside
+the Streamlit script run, so the page stays responsive and a rerun caused by
+a widget change does not throw the work away: sessions keep only the job ID
+and poll the job for its progress, partial results and final result. Jobs
+stop at their next checkpoint (e.g. between chunks of rows) when cancelled.
+Partial results are dropped when a job finishes, so finished jobs kept for
+their sessions only hold the final result.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from timing import RequestProfiler, StageTimer
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind, params=None, profile=False):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params or {}
+        self.status = QUEUED
+        self.total = 0
+        self.completed = 0
+        self.message = ""
+        self.parts = []
+        self.result = None
+        self.error = None
+        # Problems that did not stop the job, shown with its result
+        self.warnings = []
+        self.timer = StageTimer(kind)
+        self.profiler = RequestProfiler(enabled=profile)
+        self.submitted = time.time()
+        self.finished_at = None
+        self.recorded = False
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, CANCELLED, FAILED)
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    # Block until the job has finished or timeout seconds passed; True if finished
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    # Fraction of the work completed, between 0 and 1
+    def progress(self):
+        if self.status == DONE:
+            return 1.0
+        return min(self.completed / self.total, 1.0) if self.total else 0.0
+
+    # Report progress and hand over a partial result; raises JobCancelled if
+    # the job was cancelled, so work stops at this checkpoint
+    def update(self, completed=None, part=None, message=None):
+        with self._lock:
+            if completed is not None:
+                self.completed = completed
+            if part is not None:
+                self.parts.append(part)
+            if message is not None:
+                self.message = message
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    # Partial results handed over so far
+    def partial(self):
+        with self._lock:
+            return list(self.parts)
+
+
+class JobManager:
+    def __init__(self, workers=2, max_jobs=32):
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='qco-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._jobs)
+
+    # Run fn(job) in the background; its return value becomes job.result.
+    # With profile, fn runs under cProfile in the worker thread and the dump
+    # is written when the job finishes.
+    def submit(self, kind, fn, params=None, profile=False):
+        job = Job(kind, params, profile)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    # Cancel a job and stop tracking it
+    def discard(self, job_id):
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None:
+            job.cancel()
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {status: sum(1 for job in jobs if job.status == status)
+                for status in (QUEUED, RUNNING, DONE, CANCELLED, FAILED)}
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job, fn):
+        if job.cancelled:
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            job._done.set()
+            return
+        job.status = RUNNING
+        job.profiler.start()
+        try:
+            result = fn(job)
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = e
+            job.status = FAILED
+        else:
+            job.result = result
+            job.status = DONE
+        job.profiler.stop(job.kind, job.timer.request_id)
+        with job._lock:
+            job.parts = []
+        job.finished_at = time.time()
+        job._done.set()
+
+    # Forget the oldest finished jobs beyond max_jobs
+    def _trim(self):
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished]:
+            if len(self._jobs) <= self.max_jobs:
+                break
+            del self._jobs[job_id]
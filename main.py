@@ -1,10 +1,17 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import pickle
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import plotly.express as px
+import hashlib
+import io
+import os
+import threading
+import time
+
+# Only light modules are imported up front. pandas, scikit-learn and Plotly
+# are imported where they are first used, after the upload widget is on
+# screen, so a cold start paints the page without waiting for them.
+from timing import RequestProfiler, StageHistory, StageTimer, stage
+
+# Timer of this script run, started before the page is configured
+run_timer = StageTimer()
 
 # Custom styling and page configuration
 st.set_page_config(
@@ -190,241 +197,641 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-# Define custom class if needed for unpickling
-class GroupRareSilhouette:
-    def __init__(self):
-        pass
+# Memory cap of the upload store shared by all sessions, in MB
+STORE_MAX_MB = float(os.environ.get('QCO_STORE_MB', '1024'))
+
+# Seconds after which an idle session stops holding its uploads in the store
+SESSION_TTL = float(os.environ.get('QCO_SESSION_TTL', '3600'))
+
+# Worker processes used for batch scoring (1 scores in the app process)
+SCORING_WORKERS = int(os.environ.get('QCO_WORKERS', '1'))
+
+# Background scoring jobs: worker threads, rows per progress step, seconds
+# between progress polls and partial result rows shown while running
+JOB_WORKERS = int(os.environ.get('QCO_JOB_WORKERS', '2'))
+JOB_CHUNK_ROWS = int(os.environ.get('QCO_JOB_CHUNK_ROWS', '5000'))
+JOB_POLL_SECONDS = 0.5
+PARTIAL_ROWS = 50
+
+# Seconds the run that submits a job waits for it, so quick jobs (a single
+# prediction) show their results without a progress poll
+JOB_QUICK_SECONDS = 0.25
 
-    def transform(self, X):
-        return X
+# What-if panel: most activities completed together, and combinations listed
+WHAT_IF_MAX_K = 3
+WHAT_IF_ROWS = 10
 
+# SQLite file every scored row is appended to ('' turns the history off),
+# and the days of history shown by default
+HISTORY_PATH = os.environ.get('QCO_HISTORY_PATH',
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), 'qco_history.sqlite'))
+HISTORY_DAYS = 90
 
-# Cached model loading function
+# Drift monitor: rows collected as the baseline when there is no baseline
+# file (see monitor.py), and an optional file keeping the running totals
+DRIFT_WARMUP_ROWS = int(os.environ.get('QCO_DRIFT_WARMUP', '5000'))
+DRIFT_STATE_PATH = os.environ.get('QCO_DRIFT_STATE')
+
+# Prediction cache settings (QCO_CACHE_PATH enables on-disk persistence)
+CACHE_MAX_ENTRIES = int(os.environ.get('QCO_CACHE_SIZE', '100000'))
+CACHE_TTL = float(os.environ.get('QCO_CACHE_TTL', str(8 * 3600)))
+CACHE_PATH = os.environ.get('QCO_CACHE_PATH')
+
+
+# Prediction cache shared by all sessions
 @st.cache_resource
-def load_model(path):
-    with open(path, 'rb') as f:
-        return pickle.load(f)
-
-
-# Load models
-try:
-    model1 = load_model("new_rf_qco.pkl")  # Historia - Classification model
-    model2 = load_model("lr_qco.pkl")  # Critical Path - Regression model
-    model3 = load_model("qco_predictor.pkl")  # Talento - Classification
-except FileNotFoundError:
-    st.error("⚠️ Model files not found. Please ensure model files are in the same directory.")
-    st.stop()
-
-# Features for models
-model1_features = ['Priority', 'Tier', 'Module Repeatability', 'Efficiency', 'Module Achievement']
-model2_features = [
-    'Do-ability  Sample complete by Technician',
-    'Focus training Plan with 4Ms,Focus Training 70% TM Count',
-    'Team Member Allocation for Layout', 'Floater allocation for QCO',
-    'Critical /M/C Pre-setup(done by Mech, check by GL, check by QC)',
-    'M/C, Layout and space allocation on time for QCO',
-    'Feeding Plan Ready', 'STW Sheet Handover On time',
-    'Standard video sharing',
-    'Cut-Kit received by 4.30 pm/Checked cut Panels with  Patterns',
-    'Mechanic on time attend  - 7.30am,M/C Setting start on time - 7.30am,GL attend on time - 7.30am',
-    'Sample Done By GL on plan time',
-    'TM Training Start on plan time,TM training complete with mockups',
-    "All operation's  mockups Verify by QC",
-    'All Work Place Arranged & defined', 'One Hour Production',
-    '1st 10 PCS Review ', 'Yamazumi Done by IE ',
-    "TM's 70% potential Efficiency Availability", 'Changeover Quality FTT',
-    'Module Machine movement on time'
-]
-model3_features = [
-    'Priority',
-    'Skill'
-]
-
-
-# Create enhanced gauge chart
-def create_gauge_chart(value, title, color="darkblue", height=300):
-    # Define color gradient based on value
-    if value < 50:
-        bar_color = "firebrick"
-    elif value < 75:
-        bar_color = "orange"
-    else:
-        bar_color = "forestgreen"
-
-    # Create the gauge chart with white bold percentage
-    fig = go.Figure(go.Indicator(
-        mode="gauge+number",
-        value=value,
-        number={
-            'valueformat': '.1f',
-            'suffix': '%',
-            'font': {
-                'size': 28,  # Increased size
-                'color': 'white',  # White color
-                'family': "Arial Black"  # Bold font
-            }
-        },
-        title={
-            'text': title,
-            'font': {
-                'size': 16,
-                'color': '#333',
-                'family': 'Arial'
-            }
-        },
-        gauge={
-            'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': "#333"},
-            'bar': {'color': bar_color},
-            'bgcolor': "white",
-            'borderwidth': 2,
-            'bordercolor': "#333",
-            'steps': [
-                {'range': [0, 25], 'color': "#ffcccc"},
-                {'range': [25, 50], 'color': "#ffebcc"},
-                {'range': [50, 75], 'color': "#e6ffcc"},
-                {'range': [75, 100], 'color': "#ccffcc"}
-            ],
-        }
-    ))
-
-    # Layout adjustments for better contrast
-    fig.update_layout(
-        height=height,
-        margin=dict(t=50, b=30, l=30, r=30),
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white')  # Ensures all text is white by default
-    )
+def get_prediction_cache():
+    from prediction_cache import PredictionCache
+    return PredictionCache(CACHE_MAX_ENTRIES, CACHE_TTL, CACHE_PATH)
 
-    return fig
-
-
-# Create comparison chart
-def create_comparison_chart(values, titles, colors):
-    fig = go.Figure()
-
-    for i, (value, title, color) in enumerate(zip(values, titles, colors)):
-        fig.add_trace(go.Bar(
-            x=[title],
-            y=[value],
-            name=title,
-            marker_color=color,
-            text=f"{value:.1f}%",
-            textposition='auto',
-            textfont=dict(color='white', size=14)  # White text on bars
-        ))
-
-    fig.update_layout(
-        title={
-            'text': "Model Comparison",
-            'font': {
-                'size': 18,
-                'color': 'white'  # White title
-            }
-        },
-        height=400,
-        yaxis=dict(
-            range=[0, 100],
-            title=dict(
-                text="Hit Rate (%)",
-                font=dict(color='white')
-            ),
-            tickfont=dict(color='white')   # <— y‑axis tick labels
-    ),
-    xaxis=dict(
-        tickfont=dict(color='white')   # <— x‑axis tick labels
-    ),
-        legend=dict(
-            font=dict(color='white')  # White legend text
-        ),
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
+
+# Score history shared by all sessions, or None when it is turned off or
+# its file cannot be opened
+@st.cache_resource
+def get_score_history():
+    import sqlite3
+    from history import ScoreHistory
+
+    if not HISTORY_PATH:
+        return None
+    try:
+        return ScoreHistory(HISTORY_PATH)
+    except (OSError, sqlite3.Error) as e:
+        st.warning(f"⚠️ Score history is unavailable: {e}")
+        return None
+
+
+# Drift monitor shared by all sessions, or None if its files cannot be read
+@st.cache_resource
+def get_drift_monitor():
+    from monitor import DriftMonitor
+
+    try:
+        return DriftMonitor.open(path=DRIFT_STATE_PATH, warmup_rows=DRIFT_WARMUP_ROWS)
+    except (OSError, ValueError) as e:
+        st.warning(f"⚠️ Drift monitoring is unavailable: {e}")
+        return None
+
+
+# Parsed uploads and batch scores shared by all sessions, keyed by content hash
+@st.cache_resource
+def get_data_store():
+    from datastore import SharedStore
+    return SharedStore(int(STORE_MAX_MB * 2 ** 20), SESSION_TTL)
+
+
+# Identifier of this browser session in the data store and timing logs
+def session_id():
+    import uuid
+    return st.session_state.setdefault('session_id', uuid.uuid4().hex[:12])
+
+
+# Check the model files once per process, then load the models in a
+# background thread so the UI stays usable; a prediction made before the
+# load finishes waits for it (scoring.get_model holds a lock per load)
+@st.cache_resource(show_spinner=False)
+def start_model_loading():
+    from scoring import check_model_files, load_models
+    check_model_files()
+    thread = threading.Thread(target=load_models, name="qco-model-loader", daemon=True)
+    thread.start()
+    return thread
+
+
+# Parse and normalize an uploaded table and build its lookups. Columnar
+# formats load only the columns the models use.
+def load_workbook(file_type, file_bytes, timer=None):
+    from scoring import build_row_index, normalize_keys, read_table, required_columns
+
+    with st.spinner("Reading file..."):
+        with stage(timer, "read"):
+            df = read_table(io.BytesIO(file_bytes), file_type, required_columns())
+        with stage(timer, "clean"):
+            df = normalize_keys(df)
+        with stage(timer, "index"):
+            row_index = build_row_index(df)
+            module_style_map = df.groupby('Module Number')['Style Number'].unique().apply(list).to_dict()
+    return {'df': df, 'row_index': row_index, 'module_style_map': module_style_map}
+
+
+# Return the content hash and the parsed data of an uploaded file. The data
+# lives once in the shared store however many sessions upload the same file.
+def get_uploaded_data(uploaded_file, timer=None):
+    # Hash each upload only once per session
+    cached = st.session_state.get('file_hash')
+    if cached is None or cached[0] != uploaded_file.file_id:
+        cached = (uploaded_file.file_id, hashlib.sha256(uploaded_file.getvalue()).hexdigest())
+        st.session_state.file_hash = cached
+    file_hash = cached[1]
+
+    from scoring import table_type
+    data = get_data_store().get_or_load(
+        file_hash, session_id(),
+        lambda: load_workbook(table_type(uploaded_file.name), uploaded_file.getvalue(), timer)
     )
+    return file_hash, data
 
-    return fig
-
-
-# Radar chart for model impact
-def create_radar_chart(values, titles):
-    fig = go.Figure()
-
-    fig.add_trace(go.Scatterpolar(
-        r=values,
-        theta=titles,
-        fill='toself',
-        fillcolor='rgba(76, 175, 80, 0.3)',
-        line=dict(color='rgb(76, 175, 80)', width=2),
-        name="Model Impact"
-    ))
-
-    fig.update_layout(
-        polar=dict(
-            radialaxis=dict(
-                visible=True,
-                range=[0, 100]
-            ),
-            angularaxis=dict(
-                tickfont=dict(size=12),
+
+# Store key of the batch scores of an upload for the given model flags
+def batch_key(file_hash, model_flags):
+    return f"{file_hash}:scores:{''.join('1' if flag else '0' for flag in model_flags)}"
+
+
+# Background job manager shared by all sessions
+@st.cache_resource
+def get_job_manager():
+    from jobs import JobManager
+    return JobManager(JOB_WORKERS)
+
+
+# This session's current job, if the manager still has it
+def current_job():
+    job_id = st.session_state.get('job_id')
+    return get_job_manager().get(job_id) if job_id else None
+
+
+# Submit fn as this session's job, replacing (and cancelling) its previous
+# one. A job of the same kind for the same key that has not failed or been
+# cancelled is kept instead, so repeated clicks do not recompute it.
+def start_job(kind, key, fn, params):
+    from jobs import CANCELLED, FAILED
+
+    manager = get_job_manager()
+    previous = current_job()
+    if previous is not None:
+        if previous.kind == kind and previous.params.get('key') == key \
+                and previous.status not in (CANCELLED, FAILED):
+            return previous
+        manager.discard(previous.id)
+    job = manager.submit(kind, fn, dict(params, key=key), profile=st.session_state.get('profile_requests', False))
+    st.session_state.job_id = job.id
+    return job
+
+
+# Add newly scored rows to the score history, if there is one. A failed
+# write becomes a job warning instead of failing the scoring.
+def record_history(job, history, df, scores, source):
+    if history is None:
+        return
+    try:
+        with job.timer.stage("history"):
+            history.add(df, scores, source=source)
+    except Exception as e:
+        job.warnings.append(f"These scores were not saved to the score history: {e}")
+
+
+# Count newly scored rows into the drift monitor, if there is one; returns
+# the drift alerts of these rows
+def monitor_drift(job, monitor, df, scores):
+    from monitor import alerts
+
+    if monitor is None:
+        return []
+    with job.timer.stage("drift"):
+        report = monitor.update(df, scores)
+    return alerts(report) if report is not None else []
+
+
+# Score the selected row(s) and explain the scores with per-feature
+# contributions, in a background job (waits for the models if they are
+# still loading), adding the scores to the history and drift monitor if
+# there are any. weights (as for scoring.combine) give the final score.
+# Returns (row scores, {model: (base, contributions)}, drift alerts).
+def run_predict_job(job, rows, model_flags, cache, history=None, monitor=None, weights=None):
+    from explain import contributions
+    from scoring import enabled_models, score
+
+    job.total = 2
+    job.update(0, message="Scoring...")
+    with job.timer.stage("score"):
+        scores = score(rows, *model_flags, cache=cache, timer=job.timer, weights=weights)
+    record_history(job, history, rows, scores, 'predict')
+    drift = monitor_drift(job, monitor, rows, scores)
+    row_scores = scores.iloc[0]
+    job.update(1, message="Explaining...")
+    explanations = {}
+    for name in enabled_models(*model_flags):
+        try:
+            with job.timer.stage(f"explain:{name}"):
+                base, values = contributions(name, rows)
+        except ValueError:
+            continue
+        explanations[name] = (base[0], values.iloc[0])
+    job.update(2)
+    return row_scores, explanations, drift
+
+
+# Scores of every row of an upload, computed in a background job. Scores
+# already in the shared store are reused, rows unchanged since the last
+# batch this session scored are carried forward, and otherwise rows are
+# scored in chunks, each handed to the job as a partial result. Newly
+# computed scores are added to the history and drift monitor, if there are
+# any, with the final score combined with weights. The shared scores keep
+# the default weights, since other sessions may weigh the models differently.
+# Returns (store key of the scores, rows re-scored, drift alerts); the scores
+# themselves stay in the shared store only. Runs outside the script run, so
+# everything it needs from the session is passed in.
+def run_batch_job(job, file_hash, df, model_flags, previous, session, store, cache, history=None,
+                  monitor=None, weights=None):
+    import pandas as pd
+    from parallel import iter_score_parallel
+    from scoring import rescore_incremental, reweight, score
+
+    job.total = len(df)
+    key = batch_key(file_hash, model_flags)
+    drift = []
+    with job.timer.stage("score"):
+        batch_scores = store.get(key, session)
+        if batch_scores is not None:
+            rescored = 0
+        else:
+            previous_data = previous_scores = None
+            if previous and previous['model_flags'] == model_flags:
+                previous_data = store.get(previous['file_hash'])
+                previous_scores = store.get(batch_key(previous['file_hash'], model_flags))
+            if previous_data is not None and previous_scores is not None:
+                job.update(message="Re-scoring changed rows...")
+                batch_scores, changed = rescore_incremental(
+                    previous_data['df'], previous_scores, df, *model_flags, cache=cache
+                )
+                rescored = int(changed.sum())
+            else:
+                parts = []
+                if SCORING_WORKERS > 1:
+                    # The whole frame goes to the pool at once, so every worker is busy;
+                    # shards of at most JOB_CHUNK_ROWS rows report progress as they finish
+                    job.update(0, message=f"Scoring {len(df):,} rows on {SCORING_WORKERS} workers...")
+                    for part in iter_score_parallel(df, SCORING_WORKERS, *model_flags,
+                                                    max_shard_rows=JOB_CHUNK_ROWS, cache=cache):
+                        parts.append(part)
+                        job.update(job.completed + len(part), part=part)
+                else:
+                    for start in range(0, max(len(df), 1), JOB_CHUNK_ROWS):
+                        job.update(start, message=f"Scoring rows {start + 1:,}-"
+                                                  f"{min(start + JOB_CHUNK_ROWS, len(df)):,} of {len(df):,}...")
+                        chunk = df.iloc[start:start + JOB_CHUNK_ROWS]
+                        part = score(chunk, *model_flags, cache=cache, timer=job.timer)
+                        parts.append(part)
+                        job.update(start + len(chunk), part=part)
+                batch_scores = pd.concat(parts) if len(parts) > 1 else parts[0]
+                rescored = len(batch_scores)
+            store.put(key, batch_scores, session)
+            weighted = reweight(batch_scores, weights) if weights is not None else batch_scores
+            if history is not None:
+                job.update(message="Saving to history...")
+            record_history(job, history, df, weighted, 'batch')
+            drift = monitor_drift(job, monitor, df, weighted)
+    job.update(len(df))
+    return key, rescored, drift
+
+
+# Start scoring every row of the upload in the background. The session's
+# previous batch is released once superseded.
+def start_batch_job(kind, file_hash, df, model_flags, weights=None):
+    store = get_data_store()
+    key = batch_key(file_hash, model_flags)
+    previous = st.session_state.get('last_batch')
+    if previous and batch_key(previous['file_hash'], previous['model_flags']) != key:
+        store.release(batch_key(previous['file_hash'], previous['model_flags']), session_id())
+    st.session_state.last_batch = {'file_hash': file_hash, 'model_flags': model_flags}
+
+    # A finished job whose scores were evicted from the store is run again
+    job = current_job()
+    if job is not None and job.finished and key not in store:
+        get_job_manager().discard(job.id)
+
+    args = (file_hash, df, model_flags, previous, session_id(), store, get_prediction_cache(), get_score_history(),
+            get_drift_monitor(), weights)
+    return start_job(kind, key, lambda job: run_batch_job(job, *args), {'model_flags': model_flags})
+
+
+# Scores of a finished batch job, read back from the shared store; None (with
+# a notice in container) if they were evicted since
+def batch_job_scores(job, container):
+    batch_scores = get_data_store().get(job.result[0], session_id())
+    if batch_scores is None:
+        with container:
+            st.info("ℹ️ These scores were dropped from memory to make room for newer uploads. "
+                    "Press the button again to re-score the file.")
+    return batch_scores
+
+
+# Progress of this session's running job, polled without rerunning the whole
+# page; the page reruns to show the results once the job has finished
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_job_progress(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+
+    col_progress, col_cancel = st.columns([5, 1])
+    with col_progress:
+        st.progress(job.progress(), text=job.message or "Waiting for a free worker...")
+    with col_cancel:
+        if st.button("✖ Cancel", key=f"cancel_{job.id}", use_container_width=True):
+            job.cancel()
+            st.rerun()
+
+    # Rows scored so far, best first
+    parts = job.partial()
+    if parts:
+        import pandas as pd
+        from scoring import rank_scores
+
+        partial = rank_scores(pd.concat(parts))
+        st.caption(f"{len(partial):,} of {job.total:,} rows scored so far")
+        st.dataframe(partial.head(PARTIAL_ROWS), hide_index=True, use_container_width=True)
+
+
+# Draw a Plotly figure, timed as the render stage
+def render_chart(fig, timer=None):
+    with stage(timer, "render"):
+        st.plotly_chart(fig, use_container_width=True)
+
+
+# Draw an HTML chart, timed as the render stage
+def render_html(html, timer=None):
+    with stage(timer, "render"):
+        st.markdown(html, unsafe_allow_html=True)
+
+
+# Gauge chart, drawn as HTML in lite mode
+def show_gauge(value, color, lite, height=300, timer=None):
+    from charts import create_gauge_chart, gauge_html
+
+    if lite:
+        with stage(timer, "figures"):
+            html = gauge_html(value, height)
+        render_html(html, timer)
+    else:
+        with stage(timer, "figures"):
+            fig = create_gauge_chart(value, "", color, height=height)
+        render_chart(fig, timer)
+
+
+# Ranked bar chart of the largest feature contributions to one model's score
+def show_contributions(explanation, lite, timer=None):
+    from charts import contributions_html, create_contribution_chart
+    from explain import top_contributions
+
+    if explanation is None:
+        return
+    base, values = explanation
+    base = round(float(base), 1) + 0.0  # no "-0.0%" for a tiny negative intercept
+    top = top_contributions(values)
+    labels = [name if len(name) <= 40 else name[:39] + "…" for name in top.index]
+    with stage(timer, "figures"):
+        if lite:
+            html = contributions_html(labels, top.to_numpy(), base)
+        else:
+            fig = create_contribution_chart(labels, top.to_numpy(), base, height=80 + 28 * len(top))
+    if lite:
+        render_html(html, timer)
+    else:
+        render_chart(fig, timer)
+
+
+# History tab: a module's scores over time, read from the history index
+def show_history(default_module=None):
+    import datetime
+
+    from charts import build_history_chart
+
+    history = get_score_history()
+    if history is None:
+        st.caption("Score history is turned off (set QCO_HISTORY_PATH to a SQLite file to keep it).")
+        return
+    modules = history.modules()
+    if not modules:
+        st.caption("No scores recorded yet. Predictions and batch scores are added here as they are made.")
+        return
+
+    col_module, col_style, col_dates = st.columns([2, 2, 3])
+    with col_module:
+        module = st.selectbox("History Module", modules,
+                              index=modules.index(default_module) if default_module in modules else 0,
+                              format_func=lambda x: x.upper(), key='history_module')
+    with col_style:
+        style = st.selectbox("History Style", [None] + history.styles(module),
+                             format_func=lambda x: "All styles" if x is None else x.upper(), key='history_style')
+    with col_dates:
+        today = datetime.date.today()
+        dates = st.date_input("Scored Between (UTC)", (today - datetime.timedelta(days=HISTORY_DAYS), today),
+                              key='history_dates')
+    start, end = (dates[0], dates[-1]) if dates else (None, None)
+    end = end + datetime.timedelta(days=1) if end else None
+
+    if style is None:
+        scores = history.daily(module, start, end)
+        title = f"Module {module.upper()}: Daily Final Scores"
+        fig = build_history_chart(scores, 'Day', ['Mean Score', 'Lowest Score'], ['purple', 'firebrick'], title)
+    else:
+        scores = history.query(module, style, start, end)
+        title = f"Module {module.upper()}, Style {style.upper()}: Scores Over Time"
+        columns = [col for col in ['Final Score', 'Historia', 'Critical Path', 'Talento']
+                   if scores[col].notna().any()]
+        colors = {'Final Score': 'purple', 'Historia': 'royalblue', 'Critical Path': 'green', 'Talento': 'darkred'}
+        fig = build_history_chart(scores, 'Scored At', columns, [colors[col] for col in columns], title)
+
+    if scores.empty:
+        st.caption("No scores for this selection in the chosen dates.")
+        return
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(scores.iloc[::-1], hide_index=True, use_container_width=True,
+                 column_config={col: st.column_config.NumberColumn(format="%.1f%%")
+                                for col in ['Final Score', 'Historia', 'Critical Path', 'Talento',
+                                            'Mean Score', 'Lowest Score'] if col in scores.columns})
+    st.download_button("⬇️ Download History (CSV)", data=scores.to_csv(index=False).encode('utf-8'),
+                       file_name=f"qco_history_{module}.csv", mime="text/csv")
+
+
+# Weight slider of a model, under its checkbox (0-100, in percent)
+def weight_slider(name, enabled):
+    from scoring import MODEL_WEIGHTS
+    st.slider(f"{name} weight", 0, 100, int(round(MODEL_WEIGHTS[name] * 100)), step=5, format="%d%%",
+              key=f"weight_{name}", disabled=not enabled, label_visibility="collapsed",
+              help=f"Weight of {name} in the final score, before rescaling over the selected models")
+
+
+# Model weights chosen in the weight sliders, as {model: weight}
+def model_weights():
+    from scoring import MODEL_NAMES, MODEL_WEIGHTS
+    return {name: st.session_state.get(f"weight_{name}", MODEL_WEIGHTS[name] * 100) / 100 for name in MODEL_NAMES}
+
+
+# Share of each selected model in the final score, or None when no selected
+# model has a weight
+def weight_shares(weights, model_flags):
+    from scoring import MODEL_NAMES, normalized_weights
+    try:
+        shares = normalized_weights(weights, model_flags)
+    except ValueError:
+        return None
+    return dict(zip(MODEL_NAMES, shares))
+
+
+# Caption spelling out how the final score is made up
+def show_weight_shares(weights, model_flags):
+    from scoring import MODEL_NAMES, normalized_weights
+    if not any(model_flags):
+        return
+    try:
+        shares = normalized_weights(weights, model_flags)
+    except ValueError:
+        st.caption("Give at least one selected model a weight above 0%.")
+        return
+    terms = " + ".join(f"{share:.0%} {name}" for name, share in zip(MODEL_NAMES, shares) if share > 0)
+    st.caption(f"Final Score = {terms}")
+
+
+# What-if panel: the final score gained by completing each incomplete
+# Critical Path activity, and the best combinations of up to k of them;
+# weight is Critical Path's share of the final score
+def show_what_if(row, final_score, n_incomplete, weight, timer=None):
+    from whatif import flip_gains, sweep
+
+    gain_format = st.column_config.NumberColumn(format="+%.2f%%")
+    with st.expander("🔧 What-if: Complete Activities"):
+        with stage(timer, "what_if"):
+            gains = flip_gains(row, weight=weight)
+        st.dataframe(gains[['Activity', 'Final Score Gain']], hide_index=True, use_container_width=True,
+                     column_config={'Final Score Gain': gain_format})
+        if n_incomplete > 1:
+            k = st.slider("Activities completed together", 1, min(WHAT_IF_MAX_K, n_incomplete),
+                          min(2, n_incomplete), key='what_if_k')
+            with stage(timer, "what_if"):
+                combos = sweep(row, k, weight=weight, final_score=final_score)
+            st.caption(f"Best of {len(combos):,} combinations")
+            st.dataframe(
+                combos[['Activities', 'Final Score Gain', 'Final Score']].head(WHAT_IF_ROWS),
+                hide_index=True,
+                use_container_width=True,
+                column_config={'Final Score Gain': gain_format,
+                               'Final Score': st.column_config.NumberColumn(format="%.1f%%")}
             )
-        ),
-        showlegend=False,
-        height=400,
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-    )
 
-    return fig
-
-
-def create_comparison_bar(weighted_value, unweighted_value):
-    fig = go.Figure()
-
-    fig.add_trace(go.Bar(
-        x=['Weighted Prediction'],
-        y=[weighted_value],
-        name='Weighted Prediction',
-        marker_color='#673ab7',
-        text=[f'{weighted_value:.1f}%'],
-        textposition='auto'
-    ))
-
-    fig.add_trace(go.Bar(
-        x=['Theoretical Maximum'],
-        y=[unweighted_value],
-        name='Potential Maximum',
-        marker_color='#9575cd',
-        text=[f'{unweighted_value:.1f}%'],
-        textposition='auto'
-    ))
-
-    fig.update_layout(
-        title=dict(
-            text="Weighted vs Theoretical Maximum Comparison",
-            font=dict(color='white', size=16)
-    ),
-    yaxis=dict(
-        range=[0, 100],
-        title=dict(
-            text="Prediction Percentage",
-            font=dict(color='white')
-        ),
-        tickfont=dict(color='white')
-    ),
-    xaxis=dict(
-        tickfont=dict(color='white')
-    ),
-    legend=dict(
-        font=dict(color='white')
-    ),
-    paper_bgcolor='rgba(0,0,0,0)',
-    plot_bgcolor='rgba(0,0,0,0)',
-    height=400
-)
-    return fig
 
+# Log the stage timings of a run that did any timed work and add them to
+# the session history
+def record_timings(timer, profiler=None):
+    if not timer.stages:
+        return
+    history = st.session_state.setdefault('stage_history', StageHistory())
+    history.add(timer)
+    state_bytes, shared_bytes = session_footprint()
+    timer.log(session=session_id(), state_bytes=state_bytes, shared_bytes=shared_bytes)
+    if profiler is not None and profiler.path:
+        st.session_state.last_profile = {'path': profiler.path, 'summary': profiler.summary()}
+
+
+# Sidebar panel with per-stage latency percentiles over the session
+def show_performance():
+    import pandas as pd
+
+    history = st.session_state.get('stage_history')
+    with st.sidebar.expander("⏱️ Performance"):
+        if history is None or history.last is None:
+            st.caption("No timed requests yet in this session.")
+        else:
+            last = history.last
+            st.caption(f"Last {last.request or 'load'}: {last.elapsed() * 1000:.0f} ms · "
+                       + " · ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in last.stages.items()))
+            st.dataframe(
+                pd.DataFrame(history.percentiles()),
+                hide_index=True,
+                use_container_width=True,
+                column_config={col: st.column_config.NumberColumn(format="%.1f")
+                               for col in ["p50 (ms)", "p90 (ms)", "p99 (ms)"]}
+            )
 
-# Main app
-def main():
+        st.checkbox("Profile requests (cProfile)", key='profile_requests',
+                    help="Save a cProfile dump of each Predict / Score run")
+        profile = st.session_state.get('last_profile')
+        if profile and os.path.exists(profile['path']):
+            with open(profile['path'], 'rb') as f:
+                st.download_button("⬇️ Last Profile (.prof)", data=f.read(),
+                                   file_name=os.path.basename(profile['path']),
+                                   use_container_width=True)
+            st.code(profile['summary'], language=None)
+
+
+# Estimated bytes held by this session's own state, and by the shared
+# store entries it references
+def session_footprint():
+    from datastore import estimate_size
+    state = {key: value for key, value in st.session_state.items()}
+    return estimate_size(state), get_data_store().session_bytes(session_id())
+
+
+# Sidebar panel with the shared data store and this session's memory use
+def show_memory():
+    store = get_data_store()
+    stats = store.stats()
+    state_bytes, shared_bytes = session_footprint()
+    with st.sidebar.expander("🧠 Memory"):
+        col1, col2 = st.columns(2)
+        col1.metric("Session State", f"{state_bytes / 2 ** 20:.2f} MB")
+        col2.metric("Shared Data", f"{shared_bytes / 2 ** 20:.1f} MB",
+                    help="Store entries this session uses, shared with other sessions of the same file")
+        st.caption(f"Store {stats['bytes'] / 2 ** 20:.1f} / {stats['max_bytes'] / 2 ** 20:.0f} MB · "
+                   f"{stats['entries']} entries · {stats['sessions']} active sessions · "
+                   f"{stats['loads']} loads · {stats['evictions']} evictions")
+
+
+# Sidebar panel with the prediction cache counters
+def show_cache_stats():
+    cache = get_prediction_cache()
+    stats = cache.stats()
+    with st.sidebar.expander("⚡ Prediction Cache"):
+        col1, col2 = st.columns(2)
+        col1.metric("Hits", f"{stats['hits']:,}")
+        col2.metric("Misses", f"{stats['misses']:,}")
+        persisted = " · saved to disk" if stats['persistent'] else ""
+        st.caption(f"Hit rate {stats['hit_rate']:.0%} · "
+                   f"{stats['entries']:,} / {stats['max_entries']:,} entries{persisted}")
+        if st.button("Clear Cache", use_container_width=True):
+            cache.clear()
+            st.rerun()
+
+
+# Warning listing the features of the latest scores that drifted from the baseline
+def show_drift_alerts(drift, limit=8):
+    items = "\n".join(f"- {message}" for message in drift[:limit])
+    if len(drift) > limit:
+        items += f"\n- ...and {len(drift) - limit} more (see 📡 Drift Monitor in the sidebar)"
+    st.warning(f"📡 These inputs differ from the drift baseline:\n\n{items}")
+
+
+# Sidebar panel with the drift of all rows scored so far against the baseline
+def show_drift():
+    monitor = get_drift_monitor()
+    if monitor is None:
+        return
+    summary = monitor.stats_summary()
+    with st.sidebar.expander("📡 Drift Monitor"):
+        if summary['warming_up']:
+            st.progress(min(summary['warmup_rows'] / summary['warmup_target'], 1.0),
+                        text=f"No baseline file; collecting the first {summary['warmup_target']:,} scored rows "
+                             f"as the baseline ({summary['warmup_rows']:,} so far)")
+            return
+        report = monitor.report()
+        drifting = report[report['Status'].isin(['alert', 'warn'])]
+        col1, col2 = st.columns(2)
+        col1.metric("Rows Monitored", f"{summary['rows']:,}")
+        col2.metric("Drifting Features", len(drifting))
+        st.caption(f"Baseline: {summary['baseline_source'] or 'unnamed'} · "
+                   f"{summary['baseline_rows']:,} rows · {summary['batches']:,} batches since")
+        if len(drifting):
+            st.dataframe(drifting[['Feature', 'PSI', 'KS', 'New Values', 'Status']].sort_values('PSI', ascending=False),
+                         hide_index=True, use_container_width=True,
+                         column_config={col: st.column_config.NumberColumn(format="%.3f") for col in ['PSI', 'KS']})
+        if st.button("Reset Drift Totals", use_container_width=True):
+            monitor.reset()
+            st.rerun()
+
+
+# Main app; timer (a timing.StageTimer) collects the stage timings of this run
+def main(timer=None):
     # Main heading
     st.markdown(
         '''
@@ -543,10 +950,34 @@ def main():
         st.markdown('<p class="bold-italic-label">Upload Excel File</p>', unsafe_allow_html=True)
         uploaded_file = st.file_uploader(
             label="Upload Excel File",
-            type=["xlsx", "xls"],
+            type=["xlsx", "xls", "csv", "parquet", "feather", "arrow"],
             label_visibility="collapsed",
-            help="Please upload an Excel file containing your QCO data"
+            help="Excel, CSV, Parquet or Arrow/Feather file containing your QCO data "
+                 "(Parquet and Arrow load fastest; see convert.py)"
+        )
+        if timer is not None and 'stage_history' not in st.session_state:
+            # First run of the session: the page is usable from here on
+            timer.request = 'startup'
+            timer.mark('first_paint')
+
+        import numpy as np
+        import pandas as pd
+        from charts import (
+            MAX_HEATMAP_CELLS, bars_html, create_band_heatmap, create_comparison_bar, create_comparison_chart,
+            create_radar_chart, create_score_heatmap
+        )
+        from scoring import (
+            MODEL_FEATURES, MODEL_NAMES, combine, missing_columns, model1_features, model2_features,
+            model3_features, module_style_grid, module_summary, rank_scores, recommendation_bands, reweight,
+            score_matrix, unscored_count
         )
+        from jobs import CANCELLED, FAILED
+
+        try:
+            start_model_loading()
+        except FileNotFoundError:
+            st.error("⚠️ Model files not found. Please ensure model files are in the same directory.")
+            st.stop()
 
         # Input columns for better layout
         col1, col2 = st.columns(2)
@@ -554,32 +985,37 @@ def main():
         with col1:
             st.markdown('<p class="bold-italic-label">Module Number</p>', unsafe_allow_html=True)
 
-            # Initialize session state for storing uploaded data
-            if 'uploaded_data' not in st.session_state:
-                st.session_state.uploaded_data = None
-                st.session_state.modules = []
-                st.session_state.styles = []
-                st.session_state.module_style_map = {}
-
-            # Process uploaded file when changed
-            if uploaded_file and st.session_state.uploaded_data != uploaded_file:
-                df = pd.read_excel(uploaded_file)
-                df['Module Number'] = df['Module Number'].astype(str).str.strip().str.lower()
-                df['Style Number'] = df['Style Number'].astype(str).str.strip().str.lower()
-
-                # Create module-style mapping
-                st.session_state.module_style_map = df.groupby('Module Number')['Style Number'] \
-                    .unique().apply(list).to_dict()
-
-                st.session_state.modules = list(st.session_state.module_style_map.keys())
-                st.session_state.styles = []
-                st.session_state.uploaded_data = uploaded_file
+            # Process the uploaded file; its data is shared through the data
+            # store, so session state only keeps the content hash
+            if uploaded_file:
+                try:
+                    file_hash, data = get_uploaded_data(uploaded_file, timer)
+                except ValueError as e:
+                    st.error(f"⚠️ {e}")
+                    st.stop()
+                df = data['df']
+                module_style_map = data['module_style_map']
+            else:
+                file_hash = None
+                module_style_map = {}
+
+            # Let go of the previous upload (and its batch scores) once it is replaced
+            previous_hash = st.session_state.get('uploaded_data')
+            if previous_hash and previous_hash != file_hash:
+                get_job_manager().discard(st.session_state.pop('job_id', None))
+                if file_hash is None:
+                    get_data_store().release_session(session_id())
+                    st.session_state.pop('last_batch', None)
+                else:
+                    get_data_store().release(previous_hash, session_id())
+            st.session_state.uploaded_data = file_hash
+            modules = list(module_style_map.keys())
 
             # Module dropdown
             module_input = st.selectbox(
                 "Module Number",
-                options=st.session_state.modules,
-                index=0 if st.session_state.modules else None,
+                options=modules,
+                index=0 if modules else None,
                 format_func=lambda x: x.upper(),
                 help="Select module number from uploaded file",
                 label_visibility="collapsed"
@@ -589,8 +1025,8 @@ def main():
             st.markdown('<p class="bold-italic-label">Style Number</p>', unsafe_allow_html=True)
 
             # Update styles based on selected module
-            if module_input and st.session_state.module_style_map:
-                style_options = st.session_state.module_style_map.get(module_input, [])
+            if module_input and module_style_map:
+                style_options = module_style_map.get(module_input, [])
             else:
                 style_options = []
 
@@ -611,63 +1047,162 @@ def main():
 
             with col_model1:
                 st.markdown('<div class="model-checkbox">', unsafe_allow_html=True)
-                use_model1 = st.checkbox("Historia (30%)", value=True,  # Updated weight
+                use_model1 = st.checkbox("Historia", value=True,
                                          help="Classification model based on historical data")
                 st.markdown('</div>', unsafe_allow_html=True)
+                weight_slider("Historia", use_model1)
 
             with col_model2:
                 st.markdown('<div class="model-checkbox">', unsafe_allow_html=True)
-                use_model2 = st.checkbox("Critical Path (60%)", value=True,  # Updated weight
+                use_model2 = st.checkbox("Critical Path", value=True,
                                          help="Regression model focused on process factors")
                 st.markdown('</div>', unsafe_allow_html=True)
+                weight_slider("Critical Path", use_model2)
 
             with col_model3:
                 st.markdown('<div class="model-checkbox">', unsafe_allow_html=True)
-                use_model3 = st.checkbox("Talento (10%)", value=True,
+                use_model3 = st.checkbox("Talento", value=True,
                                          help="Classification model for talent factors")
                 st.markdown('</div>', unsafe_allow_html=True)
-
-        # Predict button
-        predict_button = st.button("🔮Predict!", use_container_width=True)
+                weight_slider("Talento", use_model3)
+
+            model_flags = (use_model1, use_model2, use_model3)
+            weights = model_weights()
+            show_weight_shares(weights, model_flags)
+
+        # Report models the file lacks columns for, found from its header
+        if uploaded_file:
+            for name in MODEL_NAMES:
+                missing = missing_columns(df, [name])
+                if missing:
+                    st.warning(f"⚠️ {name} cannot be used, the file has no "
+                               f"{', '.join(repr(col) for col in missing)} column(s).")
+
+        lite_charts = st.sidebar.toggle("Lite charts", value=False,
+                                        help="Draw results as simple HTML instead of interactive Plotly charts")
+
+        # Predict buttons
+        col_predict, col_batch, col_overview = st.columns(3)
+        with col_predict:
+            predict_button = st.button("🔮Predict!", use_container_width=True)
+        with col_batch:
+            batch_button = st.button("📋 Score All Rows", use_container_width=True,
+                                     help="Score every Module/Style in the uploaded file")
+        with col_overview:
+            overview_button = st.button("🗺️ Module Overview", use_container_width=True,
+                                        help="Heatmap of every Module/Style final score")
 
     # Divider
     st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
 
-    # Results container with scrolling
-    results_container = st.container()
+    # Results and score history tabs
+    results_container, history_container = st.tabs(["📊 Results", "📈 History"])
+    with history_container:
+        show_history(module_input)
+
+    # Start a background job for the pressed button; results are drawn from
+    # the job on this and later runs, so widget changes do not recompute them
+    if predict_button or batch_button or overview_button:
+        if timer is not None:
+            timer.request = 'predict' if predict_button else 'batch' if batch_button else 'overview'
 
-    # Prediction logic
-    if predict_button:
         # Validate inputs
         if uploaded_file is None:
             st.error("⚠️ Please upload an Excel file!")
             return
-        if not module_input or not style_input:
+        if predict_button and (not module_input or not style_input):
             st.error("⚠️ Please enter both Module and Style numbers!")
             return
         if not (use_model1 or use_model2 or use_model3):
             st.error("⚠️ Please select at least one model!")
             return
+        if not any(weights[name] > 0 for name, flag in zip(MODEL_NAMES, model_flags) if flag):
+            st.error("⚠️ Please give at least one selected model a weight above 0%!")
+            return
 
-        # Read and process data
-        try:
-            df = pd.read_excel(uploaded_file)
+        if predict_button:
+            module_key = str(module_input).strip().lower()
+            style_key = str(style_input).strip().lower()
 
-            # Clean up the columns
-            df['Module Number'] = df['Module Number'].astype(str).str.strip().str.lower()
-            df['Style Number'] = df['Style Number'].astype(str).str.strip().str.lower()
+            # Constant-time lookup through the (module, style) index
+            with stage(timer, "lookup"):
+                positions = data['row_index'].get((module_key, style_key))
 
-            module_input = str(module_input).strip().lower()
-            style_input = str(style_input).strip().lower()
+            if positions is None or len(positions) == 0:
+                st.error("⚠️ No matching record found for the provided Module and Style numbers.")
+                return
 
-            # Now match like a champ
-            row = df[(df['Module Number'] == module_input) & (df['Style Number'] == style_input)]
+            rows = df.iloc[positions[:1]]
+            cache, history, monitor = get_prediction_cache(), get_score_history(), get_drift_monitor()
+            start_job('predict', (file_hash, module_key, style_key, model_flags),
+                      lambda job: run_predict_job(job, rows, model_flags, cache, history, monitor, weights),
+                      {'module': module_key, 'style': style_key, 'model_flags': model_flags,
+                       'positions': list(positions), 'row': rows.iloc[0]})
+        else:
+            start_batch_job('batch' if batch_button else 'overview', file_hash, df, model_flags, weights)
+        current_job().wait(JOB_QUICK_SECONDS)
+
+    job = current_job()
+    if job is None:
+        return
+    if not job.finished:
+        with results_container:
+            show_job_progress(job.id)
+        return
+    if not job.recorded:
+        job.recorded = True
+        record_timings(job.timer, job.profiler)
+    if job.status == CANCELLED:
+        with results_container:
+            st.warning(f"✖ Cancelled after {job.completed:,} of {job.total:,} rows.")
+        return
+    if job.status == FAILED:
+        st.error(f"⚠️ An error occurred: {job.error}")
+        st.exception(job.error)
+        return
+    for warning in job.warnings:
+        with results_container:
+            st.warning(f"⚠️ {warning}")
+    if job.result[-1]:
+        with results_container:
+            show_drift_alerts(job.result[-1])
+
+    # Results are combined with the current weights, which may since have
+    # been set to 0% for every model the job scored
+    shares = weight_shares(weights, job.params['model_flags'])
+    if shares is None:
+        with results_container:
+            st.info("ℹ️ Give at least one selected model a weight above 0% to see the final scores.")
+        return
+
+    # Prediction results
+    if job.kind == 'predict':
+        module_input, style_input = job.params['module'], job.params['style']
+        use_model1, use_model2, use_model3 = job.params['model_flags']
+        positions = job.params['positions']
 
-            if row.empty:
-                st.error("⚠️ No matching record found for the provided Module and Style numbers.")
+        try:
+            if len(positions) > 1:
+                excel_rows = ", ".join(str(pos + 2) for pos in positions)
+                st.warning(f"⚠️ {len(positions)} rows match Module {module_input.upper()}, "
+                           f"Style {style_input.upper()} (Excel rows {excel_rows}). "
+                           f"Using the first one (row {positions[0] + 2}).")
+
+            row = job.params['row']
+            row_scores, explanations, _ = job.result
+            if row_scores['Missing Inputs']:
+                blanks = [feat for name in row_scores['Missing Inputs'].split(", ")
+                          for feat in MODEL_FEATURES[name] if pd.isna(row[feat])]
+                with results_container:
+                    st.error(f"⚠️ Module {module_input.upper()}, Style {style_input.upper()} cannot be scored by "
+                             f"{row_scores['Missing Inputs']}: blank {', '.join(repr(col) for col in blanks)}.")
                 return
 
-            row = row.iloc[0]
+            # Final score of the selected models, combined with the current weights
+            final_scores, contributions, bands = combine(score_matrix(row_scores), list(shares.values()),
+                                                         job.params['model_flags'])
+            final_prediction = final_scores[0]
+            model_impacts = dict(zip(MODEL_NAMES, contributions[0]))
 
             # Store prediction results
             results = {}
@@ -696,16 +1231,14 @@ def main():
                         </div>
                         """, unsafe_allow_html=True)
 
-                        input_data1 = pd.DataFrame({feat: [row[feat]] for feat in model1_features})
-                        proba = model1.predict_proba(input_data1)[0]
-                        hit_prob = proba[1] * 100
+                        hit_prob = row_scores["Historia"]
                         results["Historia"] = hit_prob
 
                         col1, col2 = st.columns([3, 2])
 
                         with col1:
-                            fig1 = create_gauge_chart(hit_prob, "", "royalblue")
-                            st.plotly_chart(fig1, use_container_width=True)
+                            show_gauge(hit_prob, "royalblue", lite_charts, timer=timer)
+                            show_contributions(explanations.get("Historia"), lite_charts, timer)
 
                         with col2:
                             # Feature importance display
@@ -717,12 +1250,12 @@ def main():
                             st.dataframe(feature_data.astype(str), hide_index=True, use_container_width=True)
 
                             # Overall impact
-                            impact = hit_prob * 0.3
+                            impact = model_impacts["Historia"]
                             st.markdown(f"""
                             <div style="background-color: #e6f7ff; padding: 10px; border-radius: 5px; margin-top: 10px;">
                                 <p style="margin: 0; font-weight: bold;">Impact on Final Score: {impact:.1f}%</p>
                                 <p style="margin: 0; font-size: 0.9rem; color: #666;">
-                                    (30% of total weight)
+                                    ({shares["Historia"]:.0%} of total weight)
                                 </p>
                             </div>
                             """, unsafe_allow_html=True)
@@ -739,15 +1272,14 @@ def main():
                         </div>
                         """, unsafe_allow_html=True)
 
-                        input_data2 = pd.DataFrame({feat: [row[feat]] for feat in model2_features})
-                        hit_rate = model2.predict(input_data2)[0]
+                        hit_rate = row_scores["Critical Path"]
                         results["Critical Path"] = hit_rate
 
                         col1, col2 = st.columns([3, 2])
 
                         with col1:
-                            fig2 = create_gauge_chart(hit_rate, "", "green")
-                            st.plotly_chart(fig2, use_container_width=True)
+                            show_gauge(hit_rate, "green", lite_charts, timer=timer)
+                            show_contributions(explanations.get("Critical Path"), lite_charts, timer)
 
                         with col2:
                             st.markdown('<div class="chart-title">Incomplete Critical Activities</div>',
@@ -769,14 +1301,16 @@ def main():
                                     unsafe_allow_html=True)
                             else:
                                 st.dataframe(incomplete_activities, hide_index=True, use_container_width=True)
+                                show_what_if(row, final_prediction, len(incomplete_activities),
+                                             shares["Critical Path"], timer)
 
                             # Overall impact
-                            impact = hit_rate * 0.6
+                            impact = model_impacts["Critical Path"]
                             st.markdown(f"""
                             <div style="background-color: #e6f7ff; padding: 10px; border-radius: 5px; margin-top: 10px;">
                                 <p style="margin: 0; font-weight: bold;">Impact on Final Score: {impact:.1f}%</p>
                                 <p style="margin: 0; font-size: 0.9rem; color: #666;">
-                                    (60% of total weight)
+                                    ({shares["Critical Path"]:.0%} of total weight)
                                 </p>
                             </div>
                             """, unsafe_allow_html=True)
@@ -793,16 +1327,14 @@ def main():
                         </div>
                         """, unsafe_allow_html=True)
 
-                        input_data3 = pd.DataFrame({feat: [row[feat]] for feat in model3_features})
-                        proba3 = model3.predict_proba(input_data3)[0]
-                        talent_prob = proba3[1] * 100
+                        talent_prob = row_scores["Talento"]
                         results["Talento"] = talent_prob
 
                         col1, col2 = st.columns([3, 2])
 
                         with col1:
-                            fig3 = create_gauge_chart(talent_prob, "", "darkred")
-                            st.plotly_chart(fig3, use_container_width=True)
+                            show_gauge(talent_prob, "darkred", lite_charts, timer=timer)
+                            show_contributions(explanations.get("Talento"), lite_charts, timer)
 
                         with col2:
                             # Talent factors
@@ -815,12 +1347,12 @@ def main():
                             st.dataframe(talent_data.astype(str), hide_index=True, use_container_width=True)
 
                             # Overall impact
-                            impact = talent_prob * 0.1
+                            impact = model_impacts["Talento"]
                             st.markdown(f"""
                             <div style="background-color: #e6f7ff; padding: 10px; border-radius: 5px; margin-top: 10px;">
                                 <p style="margin: 0; font-weight: bold;">Impact on Final Score: {impact:.1f}%</p>
                                 <p style="margin: 0; font-size: 0.9rem; color: #666;">
-                                    (10% of total weight)
+                                    ({shares["Talento"]:.0%} of total weight)
                                 </p>
                             </div>
                             """, unsafe_allow_html=True)
@@ -835,37 +1367,16 @@ def main():
                     impacts = []
                     impact_titles = []
 
-                    final_prediction = 0
+                    for name in MODEL_NAMES:
+                        if name in results:
+                            models_used.append(name)
+                            values.append(results[name])
+                            colors.append(model_colors[name])
+                            impacts.append(model_impacts[name])
+                            impact_titles.append(f"{name} Impact")
 
-                    if use_model1:
-                        models_used.append("Historia")
-                        values.append(results["Historia"])
-                        colors.append("royalblue")
-                        impact = results["Historia"] * 0.3
-                        impacts.append(impact)
-                        impact_titles.append("Historia Impact")
-                        final_prediction += impact
-
-                    if use_model2:
-                        models_used.append("Critical Path")
-                        values.append(results["Critical Path"])
-                        colors.append("green")
-                        impact = results["Critical Path"] * 0.6
-                        impacts.append(impact)
-                        impact_titles.append("Critical Path Impact")
-                        final_prediction += impact
-
-                    if use_model3:
-                        models_used.append("Talento")
-                        values.append(results["Talento"])
-                        colors.append("darkred")
-                        impact = results["Talento"] * 0.1
-                        impacts.append(impact)
-                        impact_titles.append("Talento Impact")
-                        final_prediction += impact
-
-                        # Calculate unweighted average
-                        unweighted_average = sum(results.values()) / len(results) if results else 0
+                    # Calculate unweighted average
+                    unweighted_average = sum(results.values()) / len(results) if results else 0
 
                     # Display combined results
                     st.markdown("""
@@ -878,27 +1389,10 @@ def main():
                     col1, col2 = st.columns([1, 1])
 
                     with col1:
-                        final_fig = create_gauge_chart(
-                            final_prediction,
-                            "",
-                            "purple",
-                            height=400
-                        )
-                        st.plotly_chart(final_fig, use_container_width=True)
+                        show_gauge(final_prediction, "purple", lite_charts, height=400, timer=timer)
 
                         # Decision guidance
-                        if final_prediction >= 85:
-                            recommendation = "✅ High probability of success - Proceed with confidence"
-                            color = "#28a745"
-                        elif final_prediction >= 70:
-                            recommendation = "🟡 Good probability - Monitor key factors"
-                            color = "#ffc107"
-                        elif final_prediction >= 50:
-                            recommendation = "⚠️ Moderate risk - Address critical gaps"
-                            color = "#fd7e14"
-                        else:
-                            recommendation = "❌ High risk - Focus more on the gaps"
-                            color = "#dc3545"
+                        _, recommendation, color = recommendation_bands[bands[0]]
 
                         st.markdown(f"""
                         <div style="background-color: {color}; color: white; padding: 15px; border-radius: 5px; margin-top: 20px; text-align: center;">
@@ -908,32 +1402,45 @@ def main():
                         """, unsafe_allow_html=True)
 
                     with col2:
-                        comparison_bar = create_comparison_bar(final_prediction, unweighted_average)
-                        st.plotly_chart(comparison_bar, use_container_width=True)
+                        if lite_charts:
+                            with stage(timer, "figures"):
+                                html = bars_html([final_prediction, unweighted_average],
+                                                 ["Weighted Prediction", "Theoretical Maximum"],
+                                                 ["#673ab7", "#9575cd"], "Weighted vs Maximum")
+                            render_html(html, timer)
+                        else:
+                            with stage(timer, "figures"):
+                                comparison_bar = create_comparison_bar(final_prediction, unweighted_average)
+                            render_chart(comparison_bar, timer)
 
                         # Model comparison chart
-                        if len(models_used) > 1:
-                            comparison_fig = create_comparison_chart(values, models_used, colors)
-                            st.plotly_chart(comparison_fig, use_container_width=True)
+                        if len(models_used) > 1 and lite_charts:
+                            with stage(timer, "figures"):
+                                html = (bars_html(values, models_used, colors, "Model Comparison")
+                                        + bars_html(impacts, impact_titles, colors, "Model Impact Analysis"))
+                            render_html(html, timer)
+                        elif len(models_used) > 1:
+                            with stage(timer, "figures"):
+                                comparison_fig = create_comparison_chart(values, models_used, colors)
+                                radar_fig = create_radar_chart(impacts, impact_titles)
+                            render_chart(comparison_fig, timer)
 
                             # Impact radar chart
-                            radar_fig = create_radar_chart(impacts, impact_titles)
                             st.markdown('<div class="chart-title">Model Impact Analysis</div>', unsafe_allow_html=True)
-                            st.plotly_chart(radar_fig, use_container_width=True)
+                            render_chart(radar_fig, timer)
 
                     # Detailed breakdown
                     st.markdown('<div class="chart-title">Detailed Score Breakdown</div>', unsafe_allow_html=True)
 
                     breakdown_data = []
                     for model, value in results.items():
-                        weight = 0.3 if model == "Historia" else 0.6 if model == "Critical Path" else 0.1
-                        impact = value * weight
+                        impact = model_impacts[model]
                         breakdown_data.append({
                             "Model": model,
                             "Raw Score": f"{value:.1f}%",
-                            "Weight": f"{weight * 100:.0f}%",
+                            "Weight": f"{shares[model] * 100:.0f}%",
                             "Weighted Impact": f"{impact:.1f}%",
-                            "Contribution": f"{(impact / final_prediction * 100):.1f}%"
+                            "Contribution": f"{(impact / final_prediction * 100 if final_prediction else 0):.1f}%"
                         })
 
                     breakdown_df = pd.DataFrame(breakdown_data)
@@ -953,6 +1460,116 @@ def main():
             import traceback
             st.exception(traceback.format_exc())
 
+    # Batch scoring results
+    elif job.kind == 'batch':
+        try:
+            batch_scores = batch_job_scores(job, results_container)
+            if batch_scores is None:
+                return
+            _, rescored, _ = job.result
+            scores = rank_scores(reweight(batch_scores, shares))
+            skipped = unscored_count(scores)
+
+            with results_container:
+                if skipped:
+                    st.warning(f"⚠️ {skipped:,} rows have blank model inputs and were not scored; "
+                               "they are listed last, with the models they lack in Missing Inputs.")
+                st.markdown(f"""
+                <div style="background-color: #d4edda; color: #155724; padding: 15px; border-radius: 5px; margin-bottom: 20px;">
+                    <h3 style="margin-top: 0;">✅ Scored {len(scores) - skipped} of {len(scores)} Module/Style rows</h3>
+                    <p style="margin: 0;">♻️ {rescored} rows re-scored, {len(scores) - rescored} carried forward</p>
+                </div>
+                """, unsafe_allow_html=True)
+
+                score_columns = [col for col in ["Historia", "Critical Path", "Talento", "Final Score"]
+                                 if col in scores.columns]
+                display_df = scores.copy()
+                display_df['Module Number'] = display_df['Module Number'].str.upper()
+                display_df['Style Number'] = display_df['Style Number'].str.upper()
+                display_df.insert(0, 'Rank', np.arange(1, len(display_df) + 1))
+
+                st.dataframe(
+                    display_df,
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config={col: st.column_config.NumberColumn(format="%.1f%%") for col in score_columns}
+                )
+                st.download_button(
+                    "⬇️ Download Scores (CSV)",
+                    data=display_df.to_csv(index=False).encode('utf-8'),
+                    file_name="qco_scores.csv",
+                    mime="text/csv"
+                )
+
+        except Exception as e:
+            st.error(f"⚠️ An error occurred: {e}")
+            import traceback
+            st.exception(traceback.format_exc())
+
+    # Module overview results
+    elif job.kind == 'overview':
+        try:
+            batch_scores = batch_job_scores(job, results_container)
+            if batch_scores is None:
+                return
+            batch_scores = reweight(batch_scores, shares)
+            final, styles = module_style_grid(batch_scores)
+            summary = module_summary(batch_scores)
+
+            with results_container:
+                at_risk = int(summary['0-50'].sum())
+                skipped = int(summary['Not Scored'].sum())
+                if skipped:
+                    st.warning(f"⚠️ {skipped:,} Module/Style combinations have blank model inputs and were not "
+                               "scored; they are left blank in the heatmap.")
+                st.markdown(f"""
+                <div class="visualization-container">
+                    <h3 style="color: purple; text-align: center; margin-top: 0;">🗺️ Module Overview</h3>
+                    <p style="text-align: center; margin: 0;">{len(summary)} modules · {int(summary['Styles'].sum())}
+                    Module/Style combinations · {at_risk} at high risk (below 50%)</p>
+                </div>
+                """, unsafe_allow_html=True)
+
+                # One heatmap trace; very large files are aggregated to band counts
+                if final.size <= MAX_HEATMAP_CELLS:
+                    with stage(timer, "figures"):
+                        fig = create_score_heatmap(final, styles)
+                else:
+                    st.info(f"{final.size:,} cells are too many to draw individually; "
+                            "showing styles per recommendation band instead.")
+                    with stage(timer, "figures"):
+                        fig = create_band_heatmap(summary)
+                render_chart(fig, timer)
+
+                st.markdown('<div class="chart-title">Modules by Lowest Score</div>', unsafe_allow_html=True)
+                summary['Module Number'] = summary['Module Number'].str.upper()
+                st.dataframe(
+                    summary.sort_values('Lowest Score', kind='stable'),
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config={col: st.column_config.NumberColumn(format="%.1f%%")
+                                   for col in ['Mean Score', 'Lowest Score']}
+                )
+
+        except Exception as e:
+            st.error(f"⚠️ An error occurred: {e}")
+            import traceback
+            st.exception(traceback.format_exc())
+
 
 if __name__ == "__main__":
-    main()
+    run_started = time.time()
+    profiler = RequestProfiler(enabled=st.session_state.get('profile_requests', False)).start()
+    try:
+        main(run_timer)
+    finally:
+        # A job submitted by this run profiles the request's work in its own
+        # thread, and its dump replaces this run's once the job has finished
+        job = current_job()
+        submitted = job is not None and job.submitted >= run_started
+        profiler.stop(None if submitted else run_timer.request, run_timer.request_id)
+    record_timings(run_timer, profiler)
+    show_performance()
+    show_memory()
+    show_cache_stats()
+    show_drift()
@@ -0,0 +1,517 @@
+"""Incremental drift monitoring of the model inputs and scores.
+
+    python monitor.py baseline reference.xlsx [--out drift_baseline.json]
+    python monitor.py check new_batch.csv
+
+A baseline records, for every model feature and score, the distribution the
+models were built on: whole-number and text features (Priority, Tier, the
+Critical Path activity flags, Module Repeatability) as value frequencies,
+and continuous ones (Efficiency, Skill, the scores) as counts over fixed
+quantile bins. Scored rows are counted into the same bins one batch at a
+time, so each batch costs one pass over its own rows, and the running totals
+are merged without revisiting earlier rows. Each batch and the running
+totals are compared with the baseline by population stability index (PSI),
+a binned two-sample Kolmogorov-Smirnov statistic and any values the baseline
+never contained. Each distinct row (Module/Style and feature values) is
+counted once, so predicting the same row again or re-scoring an unchanged
+file does not weigh it more. Without a baseline file, the first scored rows
+become the baseline.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from scoring import KEY_COLUMNS, MODEL_DIR, required_columns
+
+# Baseline written by `python monitor.py baseline`
+BASELINE_PATH = os.environ.get('QCO_DRIFT_BASELINE', os.path.join(MODEL_DIR, 'drift_baseline.json'))
+
+FORMAT_VERSION = 1
+
+# Score columns monitored alongside the features, binned on fixed 10-point bins
+SCORE_COLUMNS = ["Historia", "Critical Path", "Talento", "Final Score"]
+SCORE_EDGES = list(range(10, 100, 10))
+
+# Whole-number features with at most this many distinct baseline values are
+# compared value by value; other numeric features use BINS quantile bins
+MAX_DISCRETE = 30
+BINS = 10
+
+# Distinct values counted per categorical feature; later ones go to OTHER
+MAX_CATEGORIES = 200
+OTHER = '(other)'
+
+# Rows needed before PSI and KS are reported, PSI levels for a warning and
+# an alert, and the KS critical value coefficient (1% significance)
+MIN_ROWS = 200
+PSI_WARN = 0.1
+PSI_ALERT = 0.25
+KS_C = 1.63
+
+# New values alert only once they make up this many rows and this share of
+# the rows compared; rarer ones are listed without changing the status
+MIN_NEW_ROWS = 10
+MIN_NEW_SHARE = 0.005
+
+# Distinct rows remembered so they are counted once; the oldest are
+# forgotten beyond this (8 bytes each)
+MAX_SEEN_ROWS = 1000000
+
+# Share given to empty bins, so PSI stays finite
+_EPS = 1e-4
+
+
+# Monitored features by name, in required_columns order
+def monitored_features():
+    return [col for col in required_columns() if col not in KEY_COLUMNS]
+
+
+# Key of a categorical value: whole numbers as integers (1 and 1.0 match)
+def _category_key(value):
+    if isinstance(value, (bool, np.bool_)):
+        return str(value)
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        return str(int(value)) if float(value).is_integer() else repr(float(value))
+    return str(value).strip()
+
+
+# Value frequencies of a column as {key: count}, and the number of missing values
+def _category_counts(values):
+    counts = {}
+    for value, count in values.value_counts(dropna=True).items():
+        key = _category_key(value)
+        counts[key] = counts.get(key, 0) + int(count)
+    return counts, int(values.isna().sum())
+
+
+# Running distribution of one feature, in the bins of its baseline
+class FeatureStats:
+    def __init__(self, kind, edges=None):
+        self.kind = kind
+        self.edges = np.asarray(edges if edges is not None else [], dtype=float)
+        self.rows = 0
+        self.missing = 0
+        self.total = 0.0
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64) if kind == 'numeric' else {}
+
+    # Count a batch of values (a Series) into the bins
+    def update(self, values):
+        self.rows += len(values)
+        if self.kind == 'numeric':
+            x = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+            present = x[~np.isnan(x)]
+            self.missing += len(x) - len(present)
+            self.total += float(present.sum())
+            self.counts += np.bincount(np.searchsorted(self.edges, present, side='right'),
+                                       minlength=len(self.counts))
+            return
+        counts, missing = _category_counts(values)
+        self.missing += missing
+        for key, count in counts.items():
+            if key not in self.counts and len(self.counts) >= MAX_CATEGORIES:
+                key = OTHER
+            self.counts[key] = self.counts.get(key, 0) + count
+
+    # Add the counts of another FeatureStats with the same bins
+    def merge(self, other):
+        self.rows += other.rows
+        self.missing += other.missing
+        self.total += other.total
+        if self.kind == 'numeric':
+            self.counts += other.counts
+            return
+        for key, count in other.counts.items():
+            if key not in self.counts and len(self.counts) >= MAX_CATEGORIES:
+                key = OTHER
+            self.counts[key] = self.counts.get(key, 0) + count
+
+    def mean(self):
+        present = self.rows - self.missing
+        if self.kind != 'numeric' or not present:
+            return float('nan')
+        return self.total / present
+
+    def to_dict(self):
+        data = {'kind': self.kind, 'rows': self.rows, 'missing': self.missing, 'total': self.total}
+        if self.kind == 'numeric':
+            data.update(edges=self.edges.tolist(), counts=self.counts.tolist())
+        else:
+            data['counts'] = dict(self.counts)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data['kind'], data.get('edges'))
+        stats.rows, stats.missing, stats.total = data['rows'], data['missing'], data.get('total', 0.0)
+        if stats.kind == 'numeric':
+            stats.counts = np.asarray(data['counts'], dtype=np.int64)
+        else:
+            stats.counts = {key: int(count) for key, count in data['counts'].items()}
+        return stats
+
+    # Empty stats with the same bins
+    def empty(self):
+        return FeatureStats(self.kind, self.edges)
+
+
+# Baseline bins of one column: value frequencies for text and whole numbers
+# with few distinct values, quantile bins for the rest
+def _baseline_stats(name, values):
+    if name in SCORE_COLUMNS:
+        stats = FeatureStats('numeric', SCORE_EDGES)
+    else:
+        numeric = pd.to_numeric(values, errors='coerce')
+        present = numeric.dropna().to_numpy(dtype=float)
+        text = numeric.notna().sum() < values.notna().sum()
+        discrete = np.all(present == np.round(present)) and len(np.unique(present)) <= MAX_DISCRETE
+        if text or not len(present) or discrete:
+            stats = FeatureStats('category')
+        else:
+            quantiles = np.quantile(present, np.linspace(0, 1, BINS + 1)[1:-1])
+            stats = FeatureStats('numeric', np.unique(quantiles))
+    stats.update(values)
+    return stats
+
+
+# Baseline of the model features of df and the score columns of scores
+def build_baseline(df, scores=None, source=None):
+    features = {}
+    for col in monitored_features():
+        if col in df.columns:
+            features[col] = _baseline_stats(col, df[col])
+    if scores is not None:
+        for col in SCORE_COLUMNS:
+            if col in scores.columns:
+                features[col] = _baseline_stats(col, scores[col])
+    return {'format_version': FORMAT_VERSION, 'source': source, 'created': time.time(),
+            'rows': len(df), 'features': features}
+
+
+def save_baseline(baseline, path):
+    data = dict(baseline, features={name: stats.to_dict() for name, stats in baseline['features'].items()})
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def load_baseline(path):
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported drift baseline format: {data.get('format_version')}")
+    data['features'] = {name: FeatureStats.from_dict(stats) for name, stats in data['features'].items()}
+    return data
+
+
+# Proportions of the bins of two FeatureStats, aligned, with missing values
+# as a bin of their own; also returns the values only current has, and the
+# bin order used for KS (None when the bins have no order)
+def _aligned(expected, actual):
+    if expected.kind == 'numeric':
+        e, a = expected.counts.astype(float), actual.counts.astype(float)
+        new = []
+        order = np.arange(len(e))
+    else:
+        keys = list(expected.counts)
+        new = [key for key in actual.counts if key not in expected.counts]
+        try:
+            new.sort(key=float)
+        except ValueError:
+            new.sort()
+        keys += new
+        e = np.array([expected.counts.get(key, 0) for key in keys], dtype=float)
+        a = np.array([actual.counts.get(key, 0) for key in keys], dtype=float)
+        try:
+            order = np.argsort([float(key) for key in keys], kind='stable')
+        except ValueError:
+            order = None
+    return e, a, new, order
+
+
+# Population stability index of actual against expected
+def psi(expected, actual):
+    e, a, _, _ = _aligned(expected, actual)
+    e, a = np.append(e, expected.missing), np.append(a, actual.missing)
+    if not e.sum() or not a.sum():
+        return float('nan')
+    e = np.maximum(e / e.sum(), _EPS)
+    a = np.maximum(a / a.sum(), _EPS)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+# Largest gap between the binned CDFs of expected and actual (present values
+# only), or NaN for unordered categories
+def ks_statistic(expected, actual):
+    e, a, _, order = _aligned(expected, actual)
+    if order is None or not e.sum() or not a.sum():
+        return float('nan')
+    return float(np.max(np.abs(np.cumsum(e[order]) / e.sum() - np.cumsum(a[order]) / a.sum())))
+
+
+# KS statistic above which two samples of n and m values differ at 1% significance
+def ks_critical(n, m):
+    return KS_C * math.sqrt((n + m) / (n * m)) if n and m else float('inf')
+
+
+# Comparison of stats ({feature: FeatureStats}) with a baseline, one row per feature
+def compare(baseline, stats):
+    rows = []
+    for name, expected in baseline['features'].items():
+        actual = stats.get(name)
+        if actual is None or not actual.rows:
+            continue
+        _, _, new, _ = _aligned(expected, actual)
+        new_rows = sum(actual.counts[key] for key in new)
+        new_drift = new_rows >= MIN_NEW_ROWS and new_rows >= MIN_NEW_SHARE * actual.rows
+        enough = actual.rows >= MIN_ROWS
+        value_psi = psi(expected, actual) if enough else float('nan')
+        ks = ks_statistic(expected, actual) if enough else float('nan')
+        ks_drift = ks > ks_critical(expected.rows - expected.missing, actual.rows - actual.missing)
+        if new_drift or value_psi >= PSI_ALERT:
+            status = 'alert'
+        elif value_psi >= PSI_WARN or ks_drift:
+            status = 'warn'
+        else:
+            status = 'ok' if enough else 'few rows'
+        rows.append({
+            'Feature': name, 'Kind': expected.kind, 'Rows': actual.rows,
+            'Missing': actual.missing / actual.rows, 'PSI': value_psi, 'KS': ks,
+            'Mean': actual.mean(), 'Baseline Mean': expected.mean(),
+            'New Values': ", ".join(new), 'Status': status,
+        })
+    columns = ['Feature', 'Kind', 'Rows', 'Missing', 'PSI', 'KS', 'Mean', 'Baseline Mean', 'New Values', 'Status']
+    return pd.DataFrame(rows, columns=columns)
+
+
+# One-line descriptions of the features of a comparison that drifted,
+# alerts first, then by PSI
+def alerts(report):
+    drifting = report[report['Status'].isin(['alert', 'warn'])]
+    drifting = drifting.assign(order=drifting['Status'] == 'alert').sort_values(
+        ['order', 'PSI'], ascending=False, kind='stable', na_position='last')
+    messages = []
+    for row in drifting.to_dict('records'):
+        parts = []
+        if row['New Values'] and row['Status'] == 'alert':
+            values = row['New Values'].split(", ")
+            more = f" and {len(values) - 5} more" if len(values) > 5 else ""
+            parts.append(f"new values {', '.join(values[:5])}{more}")
+        if not np.isnan(row['PSI']):
+            parts.append(f"PSI {row['PSI']:.2f}")
+        if not np.isnan(row['KS']):
+            parts.append(f"KS {row['KS']:.2f}")
+        if not np.isnan(row['Mean']):
+            parts.append(f"mean {row['Mean']:.3g} vs {row['Baseline Mean']:.3g}")
+        messages.append(f"{row['Feature']}: {', '.join(parts)}")
+    return messages
+
+
+# Running drift statistics of every scored row against a baseline. Without a
+# baseline, the first warmup_rows rows scored become the baseline. With a
+# path, the running totals (and a warm-up baseline) survive restarts.
+class DriftMonitor:
+    def __init__(self, baseline=None, path=None, warmup_rows=5000):
+        self.baseline = baseline
+        self.path = path
+        self.warmup_rows = warmup_rows
+        self.stats = {}
+        self.batches = 0
+        self.last_report = None
+        self._warmup = []
+        # Hashes of the rows counted so far, in arrival order and sorted
+        self._seen = np.empty(0, dtype=np.uint64)
+        self._seen_sorted = self._seen
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load(path)
+
+    # Monitor with the baseline file at baseline_path, if there is one
+    @classmethod
+    def open(cls, baseline_path=BASELINE_PATH, path=None, warmup_rows=5000):
+        baseline = load_baseline(baseline_path) if baseline_path and os.path.exists(baseline_path) else None
+        return cls(baseline, path, warmup_rows)
+
+    @property
+    def rows(self):
+        return max((stats.rows for stats in self.stats.values()), default=0)
+
+    # Count the rows of a scored batch (df with its scores) not counted before
+    # into the running totals and compare them with the baseline; returns the
+    # comparison, or None if every row was counted before or the baseline is
+    # still being collected
+    def update(self, df, scores=None):
+        columns = [col for col in SCORE_COLUMNS if scores is not None and col in scores.columns]
+        with self._lock:
+            new = self._unseen(df)
+            if not new.any():
+                return None
+            if not new.all():
+                df = df[new]
+                scores = scores[new] if scores is not None else None
+            if self.baseline is None:
+                self._collect(df, scores, columns)
+                return None
+            batch = {}
+            for name, expected in self.baseline['features'].items():
+                if name in columns:
+                    values = scores[name]
+                elif name in df.columns:
+                    values = df[name]
+                else:
+                    continue
+                batch[name] = expected.empty()
+                batch[name].update(values)
+            for name, stats in batch.items():
+                self.stats.setdefault(name, stats.empty()).merge(stats)
+            self.batches += 1
+            report = compare(self.baseline, batch)
+            self.last_report = report
+            if self.path:
+                self._save(self.path)
+            return report
+
+    # Comparison of all rows counted so far with the baseline
+    def report(self):
+        with self._lock:
+            if self.baseline is None:
+                return compare({'features': {}}, {})
+            return compare(self.baseline, self.stats)
+
+    # Forget the running totals (and a warm-up baseline)
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+            self.batches = 0
+            self.last_report = None
+            if self.baseline is not None and self.baseline.get('warmup'):
+                self.baseline = None
+            self._warmup = []
+            self._seen = self._seen_sorted = np.empty(0, dtype=np.uint64)
+            for path in (self.path, self._seen_path()):
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+    def stats_summary(self):
+        with self._lock:
+            warmup = sum(len(df) for df, _ in self._warmup)
+            return {
+                'rows': self.rows, 'batches': self.batches, 'warming_up': self.baseline is None,
+                'warmup_rows': warmup, 'warmup_target': self.warmup_rows,
+                'baseline_rows': self.baseline['rows'] if self.baseline else 0,
+                'baseline_source': self.baseline.get('source') if self.baseline else None,
+            }
+
+    # Mask of the rows of df not counted before, remembering them as counted.
+    # Rows are told apart by Module/Style and feature values.
+    def _unseen(self, df):
+        columns = [col for col in KEY_COLUMNS + monitored_features() if col in df.columns]
+        keys = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+        new = ~pd.Series(keys).duplicated().to_numpy()
+        if len(self._seen_sorted):
+            positions = np.minimum(np.searchsorted(self._seen_sorted, keys), len(self._seen_sorted) - 1)
+            new &= self._seen_sorted[positions] != keys
+        added = keys[new]
+        if len(added):
+            self._seen = np.concatenate([self._seen, added])[-MAX_SEEN_ROWS:]
+            if len(self._seen) < len(self._seen_sorted) + len(added):
+                self._seen_sorted = np.sort(self._seen)
+            else:
+                added = np.sort(added)
+                self._seen_sorted = np.insert(self._seen_sorted, np.searchsorted(self._seen_sorted, added), added)
+        return new
+
+    # File the row hashes are kept in next to the state file
+    def _seen_path(self):
+        return f"{self.path}.seen.npy" if self.path else None
+
+    # Keep rows until there are warmup_rows of them, then build the baseline from them
+    def _collect(self, df, scores, columns):
+        features = [col for col in monitored_features() if col in df.columns]
+        self._warmup.append((df[features], scores[columns] if columns else None))
+        if sum(len(part) for part, _ in self._warmup) < self.warmup_rows:
+            return
+        frame = pd.concat([part for part, _ in self._warmup])
+        parts = [part for _, part in self._warmup if part is not None]
+        scored = pd.concat(parts) if parts and len(parts) == len(self._warmup) else None
+        self.baseline = build_baseline(frame, scored, source=f"first {len(frame):,} scored rows")
+        self.baseline['warmup'] = True
+        self._warmup = []
+        if self.path:
+            self._save(self.path)
+
+    def _save(self, path):
+        data = {'format_version': FORMAT_VERSION, 'batches': self.batches,
+                'stats': {name: stats.to_dict() for name, stats in self.stats.items()}}
+        if self.baseline is not None and self.baseline.get('warmup'):
+            data['baseline'] = dict(self.baseline, features={name: stats.to_dict()
+                                                             for name, stats in self.baseline['features'].items()})
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+        with open(tmp, 'wb') as f:
+            np.save(f, self._seen)
+        os.replace(tmp, self._seen_path())
+
+    def _load(self, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('format_version') != FORMAT_VERSION:
+            return
+        if self.baseline is None and 'baseline' in data:
+            data['baseline']['features'] = {name: FeatureStats.from_dict(stats)
+                                            for name, stats in data['baseline']['features'].items()}
+            self.baseline = data['baseline']
+        self.batches = data.get('batches', 0)
+        self.stats = {name: FeatureStats.from_dict(stats) for name, stats in data['stats'].items()}
+        if os.path.exists(self._seen_path()):
+            self._seen = np.load(self._seen_path())
+            self._seen_sorted = np.sort(self._seen)
+
+
+# Read and score a whole table for the command line
+def _read_scored(path):
+    from scoring import normalize_keys, read_table, score, table_type
+
+    with open(path, 'rb') as f:
+        df = normalize_keys(read_table(f, table_type(path), required_columns()))
+    return df, score(df)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drift baseline and checks for the QCO models")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('baseline', help="Build the drift baseline from a reference table")
+    build.add_argument('input', help="Reference .xlsx, .csv, .parquet or .feather file (e.g. the training data)")
+    build.add_argument('--out', default=BASELINE_PATH, help="Baseline file to write")
+    check = commands.add_parser('check', help="Compare a table with the drift baseline")
+    check.add_argument('input', help="Table to check")
+    check.add_argument('--baseline', default=BASELINE_PATH, help="Baseline file to compare with")
+    args = parser.parse_args(argv)
+
+    df, scores = _read_scored(args.input)
+    if args.command == 'baseline':
+        save_baseline(build_baseline(df, scores, source=os.path.basename(args.input)), args.out)
+        print(f"Wrote baseline of {len(df):,} rows -> {args.out}", file=sys.stderr)
+        return
+
+    monitor = DriftMonitor(load_baseline(args.baseline))
+    report = monitor.update(df, scores)
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(report.to_string(index=False))
+    for message in alerts(report):
+        print(f"DRIFT {message}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
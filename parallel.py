@@ -0,0 +1,134 @@
+"""Process-pool scoring for multi-core machines.
+
+    python parallel.py --rows 100000 --workers 8
+    python parallel.py --input history.parquet --workers 8
+
+Rows are sharded across a persistent pool of worker processes that each load
+the three models once at startup, and results are merged in input order.
+Running the module reports the speed-up over single-process scoring.
+"""
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scoring import load_models, normalize_keys, read_table, required_columns, score, table_type
+
+# Smallest shard worth sending to another process
+MIN_SHARD_ROWS = 2000
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+# Workers are started fresh rather than forked: forking the dashboard would
+# copy its threads (job pool, model loader, Streamlit server) and any locks
+# they hold in that moment into the child
+def pool_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+# Return the shared worker pool, (re)creating it with the given size
+def get_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = ProcessPoolExecutor(workers, mp_context=pool_context(), initializer=load_models)
+            _pool_workers = workers
+            # Start every worker now so the models are loaded before the first batch
+            for future in [_pool.submit(os.getpid) for _ in range(workers)]:
+                future.result()
+        return _pool
+
+
+def shutdown_pool():
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = None
+        _pool_workers = 0
+
+
+# Score df across worker processes, yielding the scores of each shard in
+# input order as they finish. Every shard is submitted up front, one per
+# worker or more when max_shard_rows caps their size (for finer progress).
+# Shards not started yet are cancelled when the caller stops early.
+# The prediction cache lives in this process and is bypassed when rows are
+# sharded to workers: their predictions are neither looked up in it nor
+# added to it. It is only used when df is too small to shard.
+def iter_score_parallel(df, workers=None, use_model1=True, use_model2=True, use_model3=True,
+                        min_shard_rows=MIN_SHARD_ROWS, max_shard_rows=None, cache=None, weights=None):
+    workers = workers or os.cpu_count() or 1
+    shards = min(workers, len(df) // min_shard_rows)
+    if shards <= 1:
+        yield score(df, use_model1, use_model2, use_model3, cache=cache, weights=weights)
+        return
+
+    if max_shard_rows:
+        shards = max(shards, -(-len(df) // max(max_shard_rows, min_shard_rows)))
+    bounds = np.linspace(0, len(df), shards + 1).astype(int)
+    pool = get_pool(workers)
+    futures = [pool.submit(score, df.iloc[start:stop], use_model1, use_model2, use_model3, weights=weights)
+               for start, stop in zip(bounds[:-1], bounds[1:])]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+# Score df across worker processes; same result as scoring.score()
+def score_parallel(df, workers=None, use_model1=True, use_model2=True, use_model3=True,
+                   min_shard_rows=MIN_SHARD_ROWS, cache=None, weights=None):
+    parts = list(iter_score_parallel(df, workers, use_model1, use_model2, use_model3, min_shard_rows,
+                                     cache=cache, weights=weights))
+    return pd.concat(parts) if len(parts) > 1 else parts[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-process and process-pool scoring")
+    parser.add_argument('--input', help="Excel, CSV, Parquet or Arrow file to score (default: synthetic rows)")
+    parser.add_argument('--rows', type=int, default=100000, help="Synthetic rows when no --input is given")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if args.input:
+        df = normalize_keys(read_table(args.input, table_type(args.input), required_columns()))
+    else:
+        from synthetic import make_frame
+        df = normalize_keys(make_frame(args.rows))
+
+    load_models()
+    start = time.perf_counter()
+    single = score(df)
+    single_time = time.perf_counter() - start
+
+    get_pool(args.workers)
+    start = time.perf_counter()
+    parallel = score_parallel(df, args.workers)
+    parallel_time = time.perf_counter() - start
+    shutdown_pool()
+
+    assert parallel.index.equals(single.index)
+    # Rows with blank model inputs are unscored (NaN) in both
+    assert parallel['Final Score'].isna().equals(single['Final Score'].isna())
+    assert np.allclose(parallel['Final Score'], single['Final Score'], equal_nan=True)
+    print(f"rows: {len(df)}")
+    print(f"single process: {single_time:.2f}s ({len(df) / single_time:,.0f} rows/s)")
+    print(f"{args.workers} workers: {parallel_time:.2f}s ({len(df) / parallel_time:,.0f} rows/s)")
+    print(f"speed-up: {single_time / parallel_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
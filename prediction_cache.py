@@ -0,0 +1,139 @@
+"""Memoization of per-row model scores.
+
+Entries are keyed by (model name, model artifact version, hash of the exact
+feature vector), held in a size-bounded LRU with a time-to-live, and
+optionally written through to a SQLite file so they survive restarts.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# SQLite allows at most 999 bound parameters per statement on older builds
+_SQL_BATCH = 500
+
+
+# 64-bit hash of every row of a feature frame (column order and dtypes matter)
+def row_hashes(X):
+    return pd.util.hash_pandas_object(X, index=False).to_numpy()
+
+
+class PredictionCache:
+    def __init__(self, max_entries=100000, ttl=8 * 3600, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, value REAL, created REAL)"
+            )
+            self._db.execute("DELETE FROM predictions WHERE created < ?", (time.time() - ttl,))
+            self._db.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(name, version, row_hash):
+        return f"{name}|{version}|{row_hash:016x}"
+
+    # Cached values for the given row hashes; returns (values, missing mask)
+    def get_many(self, name, version, hashes):
+        now = time.time()
+        values = np.full(len(hashes), np.nan)
+        missing = np.ones(len(hashes), dtype=bool)
+        keys = [self._key(name, version, row_hash) for row_hash in hashes.tolist()]
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[1] < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                values[i] = entry[0]
+                missing[i] = False
+
+            if self._db is not None and missing.any():
+                positions = {}
+                for i in np.flatnonzero(missing):
+                    positions.setdefault(keys[i], []).append(i)
+                found = self._read_disk(list(positions), now)
+                for key, (value, created) in found.items():
+                    self._store(key, value, created + self.ttl)
+                    for i in positions[key]:
+                        values[i] = value
+                        missing[i] = False
+
+            self.hits += int((~missing).sum())
+            self.misses += int(missing.sum())
+        return values, missing
+
+    def put_many(self, name, version, hashes, values):
+        now = time.time()
+        keys = [self._key(name, version, row_hash) for row_hash in hashes.tolist()]
+        values = np.asarray(values, dtype=float).tolist()
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._store(key, value, now + self.ttl)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO predictions (key, value, created) VALUES (?, ?, ?)",
+                    [(key, value, now) for key, value in zip(keys, values)]
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM predictions")
+                self._db.commit()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'persistent': self._db is not None,
+        }
+
+    # Insert into the LRU, evicting the least recently used entries
+    def _store(self, key, value, expires):
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, keys, now):
+        found = {}
+        for start in range(0, len(keys), _SQL_BATCH):
+            batch = keys[start:start + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._db.execute(
+                f"SELECT key, value, created FROM predictions WHERE key IN ({placeholders}) AND created >= ?",
+                batch + [now - self.ttl]
+            )
+            for key, value, created in rows:
+                found[key] = (value, created)
+        return found
@@ -0,0 +1,595 @@
+"""Headless QCO scoring engine.
+
+Loads the three models, selects their features and combines their scores
+into a weighted final score (30/60/10 by default, rescaled over the models
+in use). Nothing here imports Streamlit or Plotly, so it can be used from
+batch jobs and other services as well as the dashboard.
+"""
+import os
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+
+import xlsx
+from timing import stage
+
+# Directory holding the model files (the project root)
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Exported model bundle (see bundle.py), used instead of the .pkl files when present
+BUNDLE_DIR = os.environ.get('QCO_MODEL_BUNDLE', os.path.join(MODEL_DIR, 'models'))
+
+# Random forest inference backend: "sklearn", "flat" (forest.FlatForest) or
+# "auto", which uses the flat backend for batches of up to FLAT_MAX_ROWS rows
+FOREST_BACKEND = os.environ.get('QCO_FOREST_BACKEND', 'auto')
+FLAT_MAX_ROWS = 1000
+
+# Model display names in dashboard order
+MODEL_NAMES = ["Historia", "Critical Path", "Talento"]
+
+# Model files
+MODEL_FILES = {
+    "Historia": "new_rf_qco.pkl",  # Classification model
+    "Critical Path": "lr_qco.pkl",  # Regression model
+    "Talento": "qco_predictor.pkl",  # Classification model
+}
+
+# Weight of each model in the final score
+MODEL_WEIGHTS = {"Historia": 0.3, "Critical Path": 0.6, "Talento": 0.1}
+
+# Key columns identifying a changeover
+KEY_COLUMNS = ['Module Number', 'Style Number']
+
+# Input table formats by file extension
+TABLE_TYPES = {
+    '.xlsx': 'excel', '.xlsm': 'excel', '.xls': 'excel',
+    '.csv': 'csv',
+    '.parquet': 'parquet', '.pq': 'parquet',
+    '.feather': 'arrow', '.arrow': 'arrow', '.ipc': 'arrow',
+}
+
+# Features for models
+model1_features = ['Priority', 'Tier', 'Module Repeatability', 'Efficiency', 'Module Achievement']
+model2_features = [
+    'Do-ability  Sample complete by Technician',
+    'Focus training Plan with 4Ms,Focus Training 70% TM Count',
+    'Team Member Allocation for Layout', 'Floater allocation for QCO',
+    'Critical /M/C Pre-setup(done by Mech, check by GL, check by QC)',
+    'M/C, Layout and space allocation on time for QCO',
+    'Feeding Plan Ready', 'STW Sheet Handover On time',
+    'Standard video sharing',
+    'Cut-Kit received by 4.30 pm/Checked cut Panels with  Patterns',
+    'Mechanic on time attend  - 7.30am,M/C Setting start on time - 7.30am,GL attend on time - 7.30am',
+    'Sample Done By GL on plan time',
+    'TM Training Start on plan time,TM training complete with mockups',
+    "All operation's  mockups Verify by QC",
+    'All Work Place Arranged & defined', 'One Hour Production',
+    '1st 10 PCS Review ', 'Yamazumi Done by IE ',
+    "TM's 70% potential Efficiency Availability", 'Changeover Quality FTT',
+    'Module Machine movement on time'
+]
+model3_features = [
+    'Priority',
+    'Skill'
+]
+
+MODEL_FEATURES = {
+    "Historia": model1_features,
+    "Critical Path": model2_features,
+    "Talento": model3_features,
+}
+
+# Models that are pipelines ending in a RandomForestClassifier
+FOREST_MODELS = ["Historia", "Talento"]
+
+# Recommendation bands for the final score (lower bound, message, color)
+recommendation_bands = [
+    (85, "✅ High probability of success - Proceed with confidence", "#28a745"),
+    (70, "🟡 Good probability - Monitor key factors", "#ffc107"),
+    (50, "⚠️ Moderate risk - Address critical gaps", "#fd7e14"),
+    (0, "❌ High risk - Focus more on the gaps", "#dc3545"),
+]
+
+# Recommendation of rows a model could not score because of blank features
+NOT_SCORED = "⚪ Not scored - missing model inputs"
+
+
+# Define custom class if needed for unpickling
+class GroupRareSilhouette:
+    def __init__(self):
+        pass
+
+    def transform(self, X):
+        return X
+
+
+_models = {}
+_flat_forests = {}
+_versions = {}
+_models_lock = threading.Lock()
+_bundle = None
+
+
+# Load a pickled model from disk
+def load_model(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+# Return the exported model bundle, or None when only the .pkl files exist
+def get_bundle():
+    global _bundle
+    if _bundle is None and os.path.exists(os.path.join(BUNDLE_DIR, 'manifest.json')):
+        from bundle import ModelBundle
+        bundle = ModelBundle(BUNDLE_DIR)
+        for name in MODEL_NAMES:
+            if bundle.features(name) != MODEL_FEATURES[name]:
+                raise ValueError(f"Model bundle {BUNDLE_DIR} has different features for {name}")
+        _bundle = bundle
+    return _bundle
+
+
+# Raise FileNotFoundError if any model artifact is missing, without loading it
+def check_model_files():
+    bundle = get_bundle()
+    for name in MODEL_NAMES:
+        if bundle is not None:
+            path = os.path.join(bundle.path, bundle.manifest['models'][name]['file'])
+        else:
+            path = os.path.join(MODEL_DIR, MODEL_FILES[name])
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+
+
+# Version string of a model artifact, used to key cached predictions
+def model_version(name):
+    if name not in _versions:
+        bundle = get_bundle()
+        if bundle is not None:
+            _versions[name] = bundle.model_version(name)
+        else:
+            from bundle import file_sha256
+            _versions[name] = f"pkl:{file_sha256(os.path.join(MODEL_DIR, MODEL_FILES[name]))[:12]}"
+    return _versions[name]
+
+
+# Return a model by name, loading it on first use
+def get_model(name):
+    if name not in _models:
+        with _models_lock:
+            if name not in _models:
+                bundle = get_bundle()
+                if bundle is not None:
+                    _models[name] = bundle.load(name)
+                else:
+                    _models[name] = load_model(os.path.join(MODEL_DIR, MODEL_FILES[name]))
+    return _models[name]
+
+
+# Return the flattened forest of a model, built (or memory-mapped from the bundle) on first use
+def get_flat_forest(name):
+    if name not in _flat_forests:
+        model = get_model(name)
+        with _models_lock:
+            if name not in _flat_forests:
+                bundle = get_bundle()
+                if bundle is not None and bundle.has_flat_forest(name):
+                    _flat_forests[name] = bundle.load_flat_forest(name)
+                else:
+                    from forest import FlatForest
+                    _flat_forests[name] = FlatForest.from_pipeline(model)
+    return _flat_forests[name]
+
+
+# Whether a forest model should use the flat backend for n_rows rows
+def use_flat_forest(name, n_rows):
+    if name not in FOREST_MODELS or FOREST_BACKEND == 'sklearn':
+        return False
+    return FOREST_BACKEND == 'flat' or n_rows <= FLAT_MAX_ROWS
+
+
+# Load all three models, keyed by model name
+def load_models():
+    return {name: get_model(name) for name in MODEL_NAMES}
+
+
+# Lower-case and strip the Module/Style key columns in place
+def normalize_keys(df):
+    for col in KEY_COLUMNS:
+        df[col] = df[col].astype(str).str.strip().str.lower()
+    return df
+
+
+# Read an Excel workbook and normalize its key columns
+def read_workbook(source):
+    return normalize_keys(pd.read_excel(source))
+
+
+# Columns read from an input file for the given models
+def required_columns(model_names=MODEL_NAMES):
+    columns = list(KEY_COLUMNS)
+    for name in model_names:
+        columns.extend(feat for feat in MODEL_FEATURES[name] if feat not in columns)
+    return columns
+
+
+# Input format ('excel', 'csv', 'parquet' or 'arrow') of a file name
+def table_type(file_name):
+    ext = os.path.splitext(file_name)[1].lower()
+    if ext not in TABLE_TYPES:
+        raise ValueError(f"Unsupported input file type: {ext}")
+    return TABLE_TYPES[ext]
+
+
+# Header key that ignores case and runs of whitespace, so a header like
+# '1st 10 PCS Review' matches the feature name '1st 10 PCS Review '
+def header_key(name):
+    return ' '.join(str(name).split()).casefold()
+
+
+# Map each wanted column to the file header that holds it (an exact match
+# first, then the first header with the same header_key)
+def match_columns(header, columns):
+    names = [name for name in header if name is not None]
+    exact = set(names)
+    by_key = {}
+    for name in names:
+        by_key.setdefault(header_key(name), name)
+    matched = {}
+    for col in columns:
+        if col in exact:
+            matched[col] = col
+        elif header_key(col) in by_key:
+            matched[col] = by_key[header_key(col)]
+    return matched
+
+
+def _check_key_columns(matched):
+    missing = [col for col in KEY_COLUMNS if col not in matched]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(repr(col) for col in missing)}")
+
+
+# Column names of a table file, read without loading any rows
+def _header_names(source, file_type):
+    position = source.tell() if hasattr(source, 'seek') else None
+    if file_type == 'excel':
+        names = pd.read_excel(source, nrows=0).columns
+    elif file_type == 'csv':
+        names = pd.read_csv(source, nrows=0).columns
+    elif file_type == 'parquet':
+        import pyarrow.parquet as pq
+        names = pq.read_schema(source).names
+    else:
+        import pyarrow.ipc as ipc
+        names = ipc.open_file(source).schema.names
+    if position is not None:
+        source.seek(position)
+    return list(names)
+
+
+# Read a table from a path or file-object. With columns given, only those
+# columns are loaded: they are matched to the file's headers ignoring case
+# and extra whitespace, and renamed to the given names. The key columns
+# must be present, which is checked from the header before any rows are
+# parsed; other absent columns are reported as missing when scored.
+def read_table(source, file_type, columns=None):
+    if file_type not in TABLE_TYPES.values():
+        raise ValueError(f"Unsupported input file type: {file_type}")
+    if columns is None:
+        if file_type == 'excel':
+            return pd.read_excel(source)
+        if file_type == 'csv':
+            return pd.read_csv(source)
+        if file_type == 'parquet':
+            return pd.read_parquet(source)
+        return pd.read_feather(source)
+
+    if file_type == 'excel' and xlsx.is_xlsx(source):
+        # One pass over the sheet: the header row picks the columns to parse
+        matched = {}
+
+        def select(header):
+            matched.update(match_columns(header, columns))
+            _check_key_columns(matched)
+            positions = {name: i for i, name in reversed(list(enumerate(header))) if name is not None}
+            return [positions[name] for name in matched.values()]
+
+        rows = xlsx.iter_rows(source, select)
+        if next(rows, None) is None:
+            _check_key_columns(matched)
+        return compact_dtypes(pd.DataFrame(list(rows), columns=list(matched)))
+
+    matched = match_columns(_header_names(source, file_type), columns)
+    _check_key_columns(matched)
+    originals = list(matched.values())
+    if file_type == 'excel':
+        df = pd.read_excel(source, usecols=originals)
+    elif file_type == 'csv':
+        df = pd.read_csv(source, usecols=originals)
+    elif file_type == 'parquet':
+        import pyarrow.parquet as pq
+        df = pq.ParquetFile(source).read(columns=originals).to_pandas()
+    else:
+        import pyarrow.feather as feather
+        df = feather.read_table(source, columns=originals).to_pandas()
+    return compact_dtypes(df[originals].set_axis(list(matched), axis=1))
+
+
+# Store the 0/1 Critical Path activity columns as int8 instead of int64/float64
+def compact_dtypes(df):
+    for col in model2_features:
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]) and df[col].dtype != bool:
+            values = df[col]
+            if values.notna().all() and values.isin([0, 1]).all():
+                df[col] = values.astype(np.int8)
+    return df
+
+
+# Map each (module, style) pair to the positions of the rows holding it
+def build_row_index(df):
+    return df.groupby(KEY_COLUMNS, sort=False).indices
+
+
+# Names of the enabled models, in dashboard order
+def enabled_models(use_model1=True, use_model2=True, use_model3=True):
+    flags = [use_model1, use_model2, use_model3]
+    return [name for name, use in zip(MODEL_NAMES, flags) if use]
+
+
+# Columns of df needed by the given models that are missing
+def missing_columns(df, model_names=MODEL_NAMES):
+    required = []
+    for name in model_names:
+        required.extend(feat for feat in MODEL_FEATURES[name] if feat not in required)
+    return [col for col in required if col not in df.columns]
+
+
+# Raw 0-100 score of one model for every row of df; NaN for rows with a
+# blank feature, which the model cannot score. With a
+# prediction_cache.PredictionCache only rows not seen before are predicted.
+def predict_model(name, df, model=None, cache=None):
+    X = df[MODEL_FEATURES[name]]
+    complete = X.notna().all(axis=1).to_numpy()
+    if not complete.all():
+        values = np.full(len(X), np.nan)
+        if complete.any():
+            values[complete] = predict_model(name, df[complete], model, cache)
+        return values
+    if cache is None or model is not None:
+        return _predict(name, X, model)
+
+    from prediction_cache import row_hashes
+    hashes = row_hashes(X)
+    version = model_version(name)
+    values, missing = cache.get_many(name, version, hashes)
+    if missing.any():
+        values[missing] = _predict(name, X[missing])
+        cache.put_many(name, version, hashes[missing], values[missing])
+    return values
+
+
+def _predict(name, X, model=None):
+    if model is None and use_flat_forest(name, len(X)):
+        return get_flat_forest(name).predict_proba(X)[:, 1] * 100
+    model = model if model is not None else get_model(name)
+    if name == "Critical Path":
+        return np.asarray(model.predict(X), dtype=float)
+    return model.predict_proba(X)[:, 1] * 100
+
+
+# Look up the recommendation band for a single final score
+def get_recommendation(final_prediction):
+    for lower, recommendation, color in recommendation_bands:
+        if final_prediction >= lower:
+            return recommendation, color
+    return recommendation_bands[-1][1], recommendation_bands[-1][2]
+
+
+# Position in recommendation_bands of every final score (NaN and scores
+# below every band fall in the last one)
+def band_index(final_prediction):
+    final_prediction = np.asarray(final_prediction, dtype=float).reshape(-1)
+    lowers = np.array([lower for lower, _, _ in recommendation_bands], dtype=float)
+    # Bands run from the highest lower bound down, so search the negated bounds
+    index = np.searchsorted(-lowers, -final_prediction, side='left')
+    index[np.isnan(final_prediction)] = len(lowers) - 1
+    return np.minimum(index, len(lowers) - 1)
+
+
+# Recommendation band message for every final score
+def recommendation_labels(final_prediction):
+    messages = np.array([recommendation for _, recommendation, _ in recommendation_bands])
+    return messages[band_index(final_prediction)]
+
+
+# Weight of each model in MODEL_NAMES order, from a {model: weight} dict
+# (models left out weigh 0) or a sequence; MODEL_WEIGHTS by default
+def weight_vector(weights=None):
+    if weights is None:
+        weights = MODEL_WEIGHTS
+    if isinstance(weights, dict):
+        weights = [weights.get(name, 0) for name in MODEL_NAMES]
+    weights = np.asarray(weights, dtype=float).reshape(-1)
+    if len(weights) != len(MODEL_NAMES) or np.any(weights < 0) or not np.all(np.isfinite(weights)):
+        raise ValueError(f"Expected {len(MODEL_NAMES)} non-negative model weights, got {weights.tolist()}")
+    return weights
+
+
+# Weights of the enabled models rescaled to sum to 1; disabled models weigh 0
+def normalized_weights(weights=None, enabled=(True, True, True)):
+    weights = weight_vector(weights) * np.asarray(enabled, dtype=bool)
+    total = weights.sum()
+    if total <= 0:
+        raise ValueError("At least one enabled model needs a weight above 0")
+    return weights / total
+
+
+# Combine an N x 3 matrix of raw model scores (columns in MODEL_NAMES order)
+# in one pass. The weights of the enabled models are rescaled to sum to 1,
+# so turning a model off spreads its weight over the others, and columns of
+# disabled models are ignored (they may hold NaN). Returns (final scores,
+# N x 3 weighted contributions, position in recommendation_bands per row).
+def combine(matrix, weights=None, enabled=(True, True, True)):
+    matrix = np.asarray(matrix, dtype=float).reshape(-1, len(MODEL_NAMES))
+    weights = normalized_weights(weights, enabled)
+    contributions = np.where(weights > 0, matrix, 0.0) * weights
+    final_prediction = contributions.sum(axis=1)
+    return final_prediction, contributions, band_index(final_prediction)
+
+
+# N x 3 matrix of the raw model scores in a score frame (or one row of it,
+# a Series), NaN for models it has no column for
+def score_matrix(scores):
+    if isinstance(scores, pd.Series):
+        return np.array([[scores.get(name, np.nan) for name in MODEL_NAMES]], dtype=float)
+    return np.column_stack([scores[name].to_numpy(dtype=float) if name in scores.columns
+                            else np.full(len(scores), np.nan) for name in MODEL_NAMES])
+
+
+# Score every row of df with one vectorized call per enabled model.
+# Returns a frame aligned with df holding the raw score of each enabled
+# model, the weighted final score (weights as for combine) and its
+# recommendation band. A timing.StageTimer, if given, records each model's
+# predict and the combine.
+def score(df, use_model1=True, use_model2=True, use_model3=True, models=None, cache=None, timer=None,
+          weights=None):
+    names = enabled_models(use_model1, use_model2, use_model3)
+    missing = missing_columns(df, names)
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(repr(col) for col in missing)}")
+
+    scores = _key_frame(df)
+    for name in names:
+        model = models[name] if models is not None else None
+        with stage(timer, f"predict:{name}"):
+            scores[name] = predict_model(name, df, model, cache)
+    with stage(timer, "combine"):
+        return _add_final_score(scores, names, weights)
+
+
+# Empty score frame aligned with df, holding its key columns
+def _key_frame(df):
+    scores = pd.DataFrame(index=df.index)
+    for col in KEY_COLUMNS:
+        if col in df.columns:
+            scores[col] = df[col]
+    return scores
+
+
+# Weighted final score and recommendation band from the raw model scores.
+# Rows a model could not score get no final score, the NOT_SCORED
+# recommendation and the names of those models in 'Missing Inputs'.
+def _add_final_score(scores, names, weights=None):
+    final_prediction, _, bands = combine(score_matrix(scores), weights, [name in names for name in MODEL_NAMES])
+    labels = np.array([recommendation for _, recommendation, _ in recommendation_bands], dtype=object)[bands]
+    labels[np.isnan(final_prediction)] = NOT_SCORED
+    missing = np.full(len(scores), '', dtype=object)
+    for name in names:
+        gap = np.isnan(scores[name].to_numpy(dtype=float))
+        missing[gap] = np.where(missing[gap] == '', name, missing[gap] + ', ' + name)
+    scores['Final Score'] = final_prediction
+    scores['Recommendation'] = labels
+    scores['Missing Inputs'] = missing
+    return scores
+
+
+# Number of rows of a score frame that could not be scored
+def unscored_count(scores):
+    return int(scores['Final Score'].isna().sum())
+
+
+# Copy of a score frame with the final score and band recombined with other
+# weights, over the models it has scores for
+def reweight(scores, weights=None):
+    names = [name for name in MODEL_NAMES if name in scores.columns]
+    return _add_final_score(scores.copy(), names, weights)
+
+
+# Position in previous_df of every row of df, matched on (module, style) and
+# the occurrence number among duplicate keys; -1 for rows that are new
+def match_rows(previous_df, df):
+    def row_keys(frame):
+        occurrence = frame.groupby(KEY_COLUMNS, sort=False).cumcount()
+        return pd.MultiIndex.from_arrays([frame[col] for col in KEY_COLUMNS] + [occurrence])
+
+    return row_keys(previous_df).get_indexer(row_keys(df))
+
+
+# Score df reusing previous_scores (from score(previous_df, ...)) for rows
+# whose model features did not change. Each model only re-predicts the rows
+# where its own features changed. Returns the scores and a mask of re-scored rows.
+def rescore_incremental(previous_df, previous_scores, df, use_model1=True, use_model2=True,
+                        use_model3=True, cache=None, weights=None):
+    from prediction_cache import row_hashes
+
+    names = enabled_models(use_model1, use_model2, use_model3)
+    missing = missing_columns(df, names)
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(repr(col) for col in missing)}")
+
+    previous_positions = match_rows(previous_df, df)
+    matched = previous_positions >= 0
+    scores = _key_frame(df)
+    rescored = np.zeros(len(df), dtype=bool)
+
+    for name in names:
+        features = MODEL_FEATURES[name]
+        changed = ~matched
+        if name in previous_scores.columns and not missing_columns(previous_df, [name]):
+            new_hashes = row_hashes(df[features])
+            old_hashes = row_hashes(previous_df[features])
+            changed[matched] = new_hashes[matched] != old_hashes[previous_positions[matched]]
+        else:
+            changed[:] = True
+
+        values = np.empty(len(df))
+        kept = ~changed
+        values[kept] = previous_scores[name].to_numpy()[previous_positions[kept]]
+        if changed.any():
+            values[changed] = predict_model(name, df[changed], cache=cache)
+        scores[name] = values
+        rescored |= changed
+
+    return _add_final_score(scores, names, weights), rescored
+
+
+# Sort scores from best to worst final score
+def rank_scores(scores):
+    return scores.sort_values('Final Score', ascending=False, kind='stable').reset_index(drop=True)
+
+
+# One score per Module/Style (the first row of each, as a single prediction
+# uses) laid out as a module x style-slot grid. Returns the Final Score grid
+# and a same-shaped grid of the Style Numbers in each cell.
+def module_style_grid(scores):
+    first = scores.drop_duplicates(KEY_COLUMNS)
+    modules = pd.Index(first['Module Number'].unique())
+    slots = first.groupby('Module Number', sort=False).cumcount().to_numpy()
+    rows = modules.get_indexer(first['Module Number'])
+
+    final = np.full((len(modules), slots.max() + 1 if len(first) else 0), np.nan)
+    styles = np.full(final.shape, '', dtype=object)
+    final[rows, slots] = first['Final Score'].to_numpy()
+    styles[rows, slots] = first['Style Number'].to_numpy()
+    return pd.DataFrame(final, index=modules), pd.DataFrame(styles, index=modules)
+
+
+# Per-module summary of the Module/Style scores: style count, mean, lowest
+# score and the number of styles in each recommendation band ("70-85", ...)
+def module_summary(scores):
+    first = scores.drop_duplicates(KEY_COLUMNS)
+    final = first['Final Score']
+    summary = final.groupby(first['Module Number'], sort=False).agg(['count', 'mean', 'min'])
+    summary.columns = ['Styles', 'Mean Score', 'Lowest Score']
+    summary['Not Scored'] = final.isna().groupby(first['Module Number'], sort=False).sum()
+
+    upper = np.inf
+    for lower, _, _ in recommendation_bands:
+        in_band = (final >= lower) & (final < upper)
+        label = f"{lower}-{100 if upper == np.inf else upper}"
+        summary[label] = in_band.groupby(first['Module Number'], sort=False).sum()
+        upper = lower
+    return summary.rename_axis('Module Number').reset_index()
@@ -0,0 +1,262 @@
+"""Local HTTP/JSON QCO scoring service.
+
+    python serve.py --port 8502
+    python serve.py --load-test
+
+POST /score with a single row object, a list of rows or {"rows": [...]}.
+Rows carry the model1/model2/model3 feature columns (and optionally Module
+Number / Style Number). An optional "models" list restricts scoring to some
+of "Historia", "Critical Path" and "Talento". GET /health reports model and
+batching statistics.
+
+Requests arriving within --window-ms of each other are coalesced into one
+micro-batch, so every model evaluates many rows per call.
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from scoring import MODEL_FEATURES, MODEL_NAMES, load_models, missing_columns, model2_features, score
+
+
+# A queued scoring request
+class _Pending:
+    def __init__(self, df, names):
+        self.df = df
+        self.names = names
+        self.future = Future()
+
+
+# Coalesces concurrent scoring requests into micro-batches
+class MicroBatcher:
+    def __init__(self, window=0.005, max_rows=4096):
+        self.window = window
+        self.max_rows = max_rows
+        self.batches = 0
+        self.rows = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="qco-batcher", daemon=True)
+        self._thread.start()
+
+    # Queue a frame for scoring; returns a Future resolving to its scores
+    def submit(self, df, names=tuple(MODEL_NAMES)):
+        pending = _Pending(df, tuple(names))
+        self._queue.put(pending)
+        return pending.future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            rows = len(batch[0].df)
+            deadline = time.monotonic() + self.window
+            while rows < self.max_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    pending = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(pending)
+                rows += len(pending.df)
+            self._score(batch)
+
+    def _score(self, batch):
+        # Requests with the same model selection share one score() call
+        groups = {}
+        for pending in batch:
+            groups.setdefault(pending.names, []).append(pending)
+
+        for names, group in groups.items():
+            flags = [name in names for name in MODEL_NAMES]
+            try:
+                combined = pd.concat([pending.df for pending in group], ignore_index=True)
+                scores = score(combined, *flags)
+            except Exception:
+                # Score the group one by one so a bad request only fails itself
+                for pending in group:
+                    try:
+                        pending.future.set_result(score(pending.df, *flags))
+                    except Exception as e:
+                        pending.future.set_exception(e)
+                continue
+
+            offsets = np.cumsum([0] + [len(pending.df) for pending in group])
+            for pending, start, stop in zip(group, offsets[:-1], offsets[1:]):
+                pending.future.set_result(scores.iloc[start:stop])
+            self.batches += 1
+            self.rows += len(combined)
+            self.requests += len(group)
+
+
+# Parse a request body into a feature frame and the models to use
+def parse_payload(payload):
+    names = list(MODEL_NAMES)
+    if isinstance(payload, dict) and 'rows' in payload:
+        names = payload.get('models', names)
+        rows = payload['rows']
+    elif isinstance(payload, dict):
+        rows = [payload]
+    else:
+        rows = payload
+
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        raise ValueError(f"Expected \"models\" to be a list of model names, got {json.dumps(names)}")
+    unknown = [name for name in names if name not in MODEL_NAMES]
+    if unknown or not names:
+        raise ValueError(f"Unknown or empty model selection: {names}")
+    if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+        raise ValueError("Expected a row object, a list of row objects or {\"rows\": [...]}")
+
+    df = pd.DataFrame(rows)
+    missing = missing_columns(df, names)
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(repr(col) for col in missing)}")
+
+    # Feature values must be numbers; null leaves the row unscored
+    for col in dict.fromkeys(col for name in names for col in MODEL_FEATURES[name]):
+        try:
+            df[col] = pd.to_numeric(df[col], errors='raise')
+        except (ValueError, TypeError):
+            bad = df[col].notna() & pd.to_numeric(df[col], errors='coerce').isna()
+            row = int(np.flatnonzero(bad.to_numpy())[0])
+            raise ValueError(f"Non-numeric value for {col!r} in row {row}: {json.dumps(df[col].iloc[row])}")
+    return df, names
+
+
+# Convert a scores frame into JSON-serializable records
+def scores_to_records(scores):
+    scores = scores.astype(object).where(scores.notna(), None)
+    return scores.to_dict(orient='records')
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    batcher = None
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        batcher = self.batcher
+        self._send_json(200, {
+            'status': 'ok',
+            'models': MODEL_NAMES,
+            'batches': batcher.batches,
+            'requests': batcher.requests,
+            'rows': batcher.rows,
+            'mean_batch_rows': batcher.rows / batcher.batches if batcher.batches else 0,
+        })
+
+    def do_POST(self):
+        if self.path != '/score':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            df, names = parse_payload(json.loads(self.rfile.read(length)))
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+
+        try:
+            scores = self.batcher.submit(df, names).result()
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+        self._send_json(200, {'scores': scores_to_records(scores)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+# Create a scoring server; models are loaded before it starts accepting requests
+def make_server(host='127.0.0.1', port=8502, window=0.005, max_rows=4096):
+    load_models()
+    handler = type('BoundScoringHandler', (ScoringHandler,), {'batcher': MicroBatcher(window, max_rows)})
+    return ScoringServer((host, port), handler)
+
+
+# Hit a server with concurrent single-row requests and report throughput
+def run_load_test(url, row, clients=32, requests_per_client=50):
+    body = json.dumps(row).encode('utf-8')
+
+    def client():
+        for _ in range(requests_per_client):
+            request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+            with urllib.request.urlopen(request) as response:
+                response.read()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        for future in [pool.submit(client) for _ in range(clients)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    total = clients * requests_per_client
+    return {'requests': total, 'seconds': elapsed, 'requests_per_second': total / elapsed}
+
+
+# A plausible feature row used by the load test
+def sample_row():
+    row = {feat: 1 for feat in model2_features}
+    row.update({'Priority': 2, 'Tier': 23, 'Module Repeatability': 'Repeat',
+                'Efficiency': 0.65, 'Module Achievement': 0.04, 'Skill': 50})
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QCO HTTP scoring service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--window-ms', type=float, default=5.0,
+                        help="Time to wait for more requests before scoring a micro-batch")
+    parser.add_argument('--max-batch', type=int, default=4096, help="Maximum rows per micro-batch")
+    parser.add_argument('--load-test', action='store_true',
+                        help="Run a local load test with and without micro-batching, then exit")
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=50, help="Requests per client in the load test")
+    args = parser.parse_args()
+
+    if not args.load_test:
+        server = make_server(args.host, args.port, args.window_ms / 1000, args.max_batch)
+        print(f"Serving QCO scores on http://{args.host}:{server.server_port}/score")
+        server.serve_forever()
+        return
+
+    for label, window in [("no batching", 0.0), (f"{args.window_ms:g} ms window", args.window_ms / 1000)]:
+        server = make_server(args.host, 0, window, args.max_batch)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url = f"http://{args.host}:{server.server_port}/score"
+        result = run_load_test(url, sample_row(), args.clients, args.requests)
+        batcher = server.RequestHandlerClass.batcher
+        print(f"{label:>16}: {result['requests_per_second']:8.1f} req/s over {result['requests']} requests, "
+              f"{batcher.rows / max(batcher.batches, 1):.1f} rows per model call")
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Synthetic QCO tracking data with the real column schema, for benchmarks."""
+import numpy as np
+import pandas as pd
+
+from scoring import model2_features
+
+
+# Build a tracking sheet with n_rows rows and n_extra unused note columns
+def make_frame(n_rows, seed=0, n_modules=40, n_extra=0):
+    rng = np.random.default_rng(seed)
+    data = {
+        'Module Number': [f"M{i % n_modules:02d}" for i in range(n_rows)],
+        'Style Number': [f"S{i:06d}" for i in range(n_rows)],
+        'Priority': rng.integers(1, 4, n_rows),
+        'Tier': rng.integers(18, 30, n_rows),
+        'Module Repeatability': rng.choice(['New', 'Repeat'], n_rows),
+        'Efficiency': rng.uniform(0.3, 0.95, n_rows).round(3),
+        'Module Achievement': rng.uniform(-0.3, 0.4, n_rows).round(3),
+        'Skill': rng.integers(10, 95, n_rows),
+    }
+    for feat in model2_features:
+        data[feat] = (rng.random(n_rows) < 0.8).astype(int)
+    for i in range(n_extra):
+        data[f"Note {i + 1}"] = rng.choice(['ok', 'pending', 'n/a', ''], n_rows)
+    return pd.DataFrame(data)
@@ -0,0 +1,76 @@
+import io
+import re
+import zipfile
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+import xlsx
+from scoring import read_table
+
+
+# Workbook saved by openpyxl, whose formula cells have no cached value (<v/>)
+def formula_workbook():
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['Module Number', 'Style Number', 'Priority', 'Tier'])
+    sheet.append(['M01', 'S01', 2, 20])
+    sheet.append(['M02', 'S02', '=C2*2', 21])
+    sheet.append(['M03', 'S03', 3, '=D3+1'])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def test_formula_without_cached_value_reads_as_empty():
+    data = formula_workbook()
+    sheet = zipfile.ZipFile(io.BytesIO(data)).read('xl/worksheets/sheet1.xml')
+    assert re.search(rb'<f>C2\*2</f><v ?/>', sheet)
+
+    rows = list(xlsx.iter_rows(io.BytesIO(data)))
+    assert rows[2] == ['M02', 'S02', None, 21]
+    assert rows[3] == ['M03', 'S03', 3, None]
+
+
+def test_formula_without_cached_value_matches_read_excel():
+    data = formula_workbook()
+    columns = ['Module Number', 'Style Number', 'Priority', 'Tier']
+    df = read_table(io.BytesIO(data), 'excel', columns)
+    expected = pd.read_excel(io.BytesIO(data))
+
+    assert len(df) == len(expected) == 3
+    for col in ['Priority', 'Tier']:
+        np.testing.assert_array_equal(pd.to_numeric(df[col]).to_numpy(dtype=float),
+                                      expected[col].to_numpy(dtype=float))
+
+
+# Workbook saved by pandas with blank ('') and 'NA'-like text cells
+def blank_cell_workbook():
+    df = pd.DataFrame({
+        'Module Number': ['M01', 'M02', 'M03', 'M04'],
+        'Style Number': ['S01', 'S02', '', 'S04'],
+        'Priority': [2, '', 3, 'N/A'],
+        'Tier': [20, 21, 'NULL', 'x'],
+    })
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def test_blank_and_na_strings_read_as_missing():
+    rows = list(xlsx.iter_rows(io.BytesIO(blank_cell_workbook())))
+    assert rows[2] == ['M02', 'S02', None, 21]
+    assert rows[3] == ['M03', None, 3, None]
+    assert rows[4] == ['M04', 'S04', None, 'x']
+
+
+def test_blank_cells_match_read_excel():
+    data = blank_cell_workbook()
+    columns = ['Module Number', 'Style Number', 'Priority', 'Tier']
+    df = read_table(io.BytesIO(data), 'excel', columns)
+    expected = pd.read_excel(io.BytesIO(data))
+
+    pd.testing.assert_frame_equal(df.isna(), expected.isna())
+    np.testing.assert_array_equal(pd.to_numeric(df['Priority']).to_numpy(dtype=float),
+                                  expected['Priority'].to_numpy(dtype=float))
@@ -0,0 +1,148 @@
+"""Per-stage timing, structured timing logs and opt-in request profiling.
+
+A StageTimer collects how long each named stage of one dashboard run took
+(read, clean, lookup, each model's predict, figure build, render). Finished
+timers are logged as one JSON object per line on the 'qco.timing' logger,
+which QCO_TIMING_LOG=<path> also appends to a file, and StageHistory keeps
+a bounded per-session history for latency percentiles. RequestProfiler
+wraps a run in cProfile and dumps the stats to QCO_PROFILE_DIR.
+"""
+import contextlib
+import cProfile
+import datetime
+import io
+import json
+import logging
+import os
+import pstats
+import tempfile
+import time
+import uuid
+from collections import defaultdict, deque
+
+# File that structured timing records are appended to (optional)
+TIMING_LOG = os.environ.get('QCO_TIMING_LOG')
+
+# Directory profiler dumps are written to
+PROFILE_DIR = os.environ.get('QCO_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'qco-profiles'))
+
+# Samples kept per stage for the session percentiles
+HISTORY_SIZE = 500
+
+logger = logging.getLogger('qco.timing')
+if TIMING_LOG:
+    _handler = logging.FileHandler(TIMING_LOG)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+
+# Time a stage of timer, or do nothing when there is no timer
+def stage(timer, name):
+    return timer.stage(name) if timer is not None else contextlib.nullcontext()
+
+
+# Wall-clock time of the named stages of one request
+class StageTimer:
+    def __init__(self, request=None):
+        self.request = request
+        self.request_id = uuid.uuid4().hex[:12]
+        self.stages = {}
+        self._start = time.perf_counter()
+
+    # Add the time spent in the with-block to the named stage
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    # Record the time since the timer started as the named stage
+    def mark(self, name):
+        self.stages[name] = self.elapsed()
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    # Structured record of the request, also written to the timing log
+    def log(self, **fields):
+        record = {
+            'time': datetime.datetime.now().isoformat(timespec='milliseconds'),
+            'request': self.request,
+            'request_id': self.request_id,
+            'total_ms': round(self.elapsed() * 1000, 3),
+            'stages_ms': {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()},
+        }
+        record.update(fields)
+        logger.info(json.dumps(record))
+        return record
+
+
+# Recent stage latencies of one session
+class StageHistory:
+    def __init__(self, size=HISTORY_SIZE):
+        self.samples = defaultdict(lambda: deque(maxlen=size))
+        self.last = None
+
+    def add(self, timer):
+        for name, seconds in timer.stages.items():
+            self.samples[name].append(seconds)
+        self.samples['total'].append(timer.elapsed())
+        self.last = timer
+
+    # One row per stage with its sample count and latency percentiles in ms
+    def percentiles(self, quantiles=(50, 90, 99)):
+        import numpy as np
+
+        rows = []
+        for name, samples in self.samples.items():
+            values = np.percentile(np.asarray(samples) * 1000, quantiles)
+            row = {'Stage': name, 'Count': len(samples)}
+            row.update({f"p{q} (ms)": value for q, value in zip(quantiles, values)})
+            rows.append(row)
+        return rows
+
+
+# cProfile around one request, dumped to a .prof file when stopped
+class RequestProfiler:
+    def __init__(self, enabled=True, directory=PROFILE_DIR):
+        self.enabled = enabled
+        self.directory = directory
+        self.path = None
+        self._profiler = None
+
+    def start(self):
+        if not self.enabled:
+            return self
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (e.g. a concurrent session's) is already active
+            logger.warning("Profiling skipped: another profiler is active")
+            return self
+        self._profiler = profiler
+        return self
+
+    # Stop profiling; the stats are only kept for runs that served a request
+    def stop(self, request=None, request_id=None):
+        if self._profiler is None:
+            return None
+        self._profiler.disable()
+        if request:
+            os.makedirs(self.directory, exist_ok=True)
+            stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+            self.path = os.path.join(self.directory, f"{request}-{stamp}-{request_id or 'run'}.prof")
+            self._profiler.dump_stats(self.path)
+            logger.info(json.dumps({'request': request, 'request_id': request_id, 'profile': self.path}))
+        return self.path
+
+    # Top functions by cumulative time, as pstats prints them
+    def summary(self, limit=20):
+        if self._profiler is None:
+            return ""
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).strip_dirs().sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
@@ -0,0 +1,117 @@
+"""What-if simulation of completing Critical Path activities.
+
+The Critical Path model (lr_qco.pkl) is a linear regression over 0/1
+activity flags, so completing an activity raises its score by exactly that
+activity's coefficient. Single flips are therefore ranked straight from the
+coefficients, and combinations of up to k activities are scored together as
+one candidate matrix (one matrix product, or one predict call for a
+non-linear replacement model). Gains are reported on the Critical Path score
+and on the weighted final score.
+"""
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from scoring import MODEL_WEIGHTS, get_model, model2_features
+
+# Most combinations scored in one sweep
+MAX_COMBINATIONS = 50000
+
+
+# (coefficients, intercept) of a linear model in model2_features order, or
+# None if the model is not a plain linear model
+def linear_terms(model):
+    steps = getattr(model, 'steps', None)
+    if steps is not None:
+        if any(step not in (None, 'passthrough') for _, step in steps[:-1]):
+            return None
+        model = steps[-1][1]
+    coef = getattr(model, 'coef_', None)
+    if coef is None:
+        return None
+    coef = np.asarray(coef, dtype=float).reshape(-1)
+    if len(coef) != len(model2_features):
+        return None
+    return coef, float(np.asarray(model.intercept_).reshape(-1)[0])
+
+
+# Activity flags of one row as floats, and the positions of the incomplete (0) ones
+def _activities(row):
+    x = np.asarray(pd.to_numeric(pd.Series([row[feat] for feat in model2_features]), errors='coerce'),
+                   dtype=float)
+    return x, np.flatnonzero(x == 0)
+
+
+# Score gain of completing each incomplete activity of row on its own, best first
+def flip_gains(row, model=None, weight=MODEL_WEIGHTS["Critical Path"]):
+    model = model if model is not None else get_model("Critical Path")
+    x, incomplete = _activities(row)
+    terms = linear_terms(model)
+    if terms is not None:
+        gains = terms[0][incomplete]
+    else:
+        candidates = np.repeat(x[None, :], len(incomplete), axis=0)
+        candidates[np.arange(len(incomplete)), incomplete] = 1
+        base = np.asarray(model.predict(pd.DataFrame(x[None, :], columns=model2_features)), dtype=float)
+        gains = np.asarray(model.predict(pd.DataFrame(candidates, columns=model2_features)), dtype=float) - base
+
+    gains_df = pd.DataFrame({
+        'Activity': [model2_features[i] for i in incomplete],
+        'Critical Path Gain': gains,
+        'Final Score Gain': gains * weight,
+    })
+    return gains_df.sort_values('Final Score Gain', ascending=False, kind='stable').reset_index(drop=True)
+
+
+# 0/1 matrix with one row per combination of 1..k of n items
+def combination_matrix(n, k):
+    blocks = []
+    for size in range(1, min(k, n) + 1):
+        chosen = np.array(list(combinations(range(n), size)), dtype=np.intp).reshape(-1, size)
+        block = np.zeros((len(chosen), n), dtype=np.int8)
+        block[np.arange(len(chosen))[:, None], chosen] = 1
+        blocks.append(block)
+    return np.concatenate(blocks) if blocks else np.zeros((0, n), dtype=np.int8)
+
+
+# Number of combinations of 1..k of n items
+def combination_count(n, k):
+    from math import comb
+    return sum(comb(n, size) for size in range(1, min(k, n) + 1))
+
+
+# Scores of row after completing every combination of up to k of its
+# incomplete activities, best final score gain first (fewer activities
+# first among equal gains). final_score is the row's current weighted final
+# score; the result then also holds the final score after each combination.
+def sweep(row, k=2, model=None, weight=MODEL_WEIGHTS["Critical Path"], final_score=None):
+    model = model if model is not None else get_model("Critical Path")
+    x, incomplete = _activities(row)
+    if combination_count(len(incomplete), k) > MAX_COMBINATIONS:
+        raise ValueError(f"Too many combinations of {len(incomplete)} activities taken up to {k} at a time")
+
+    flips = combination_matrix(len(incomplete), k)
+    candidates = np.repeat(x[None, :], len(flips), axis=0)
+    candidates[:, incomplete] += flips
+    terms = linear_terms(model)
+    if terms is not None:
+        coef, intercept = terms
+        base = float(x @ coef + intercept)
+        scores = candidates @ coef + intercept
+    else:
+        base = float(np.asarray(model.predict(pd.DataFrame(x[None, :], columns=model2_features)))[0])
+        scores = np.asarray(model.predict(pd.DataFrame(candidates, columns=model2_features)), dtype=float)
+
+    names = np.array([model2_features[i] for i in incomplete], dtype=object)
+    result = pd.DataFrame({
+        'Activities': [" + ".join(names[mask.astype(bool)]) for mask in flips],
+        'Count': flips.sum(axis=1),
+        'Critical Path': scores,
+        'Critical Path Gain': scores - base,
+        'Final Score Gain': (scores - base) * weight,
+    })
+    if final_score is not None:
+        result['Final Score'] = final_score + result['Final Score Gain']
+    return result.sort_values(['Final Score Gain', 'Count'], ascending=[False, True],
+                              kind='stable').reset_index(drop=True)
@@ -0,0 +1,174 @@
+"""Column-projected reader for .xlsx / .xlsm worksheets.
+
+pd.read_excel (and openpyxl underneath it) turns every cell of the sheet
+into a Python object before unused columns can be dropped. This reader
+streams the first worksheet's XML and only converts the cells of the
+requested columns; cells of other columns are skipped unparsed. Values are
+converted the way openpyxl does: shared and inline strings, booleans,
+integers and floats, and dates for cells with a date number format. Error
+cells (#N/A, #DIV/0! ...), empty strings and the strings pd.read_excel
+treats as missing by default ('NA', 'N/A', 'NULL' ...) read as missing
+values.
+"""
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+_CELL = _MAIN + 'c'
+_ROW = _MAIN + 'row'
+_VALUE = _MAIN + 'v'
+_TEXT = _MAIN + 't'
+
+# Text read as a missing value, as pd.read_excel's default na_values
+NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A',
+    'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+
+# True for the contents of an .xlsx/.xlsm file (a zip archive), given a path or file object
+def is_xlsx(source):
+    if hasattr(source, 'read'):
+        position = source.tell()
+        signature = source.read(4)
+        source.seek(position)
+        return signature == b'PK\x03\x04'
+    return zipfile.is_zipfile(source)
+
+
+# Zero-based column index of a cell reference such as "AB12"
+def column_index(ref):
+    index = 0
+    for char in ref:
+        if char.isdigit():
+            break
+        index = index * 26 + ord(char) - 64
+    return index - 1
+
+
+# Path inside the archive of the first worksheet, in workbook tab order
+def _first_sheet_path(archive):
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    rel_id = workbook.find(f'{_MAIN}sheets/{_MAIN}sheet').get(_REL + 'id')
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels.iter(_PKG_REL + 'Relationship'):
+        if rel.get('Id') == rel_id:
+            target = rel.get('Target')
+            return target.lstrip('/') if target.startswith('/') else posixpath.normpath('xl/' + target)
+    raise ValueError("Workbook has no worksheet")
+
+
+def _shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    for _, element in ET.iterparse(archive.open('xl/sharedStrings.xml')):
+        if element.tag == _MAIN + 'si':
+            # Plain text or rich text runs; phonetic (rPh) runs are not part of the value
+            texts = element.findall(_TEXT) + element.findall(f'{_MAIN}r/{_TEXT}')
+            strings.append(''.join(t.text or '' for t in texts))
+            element.clear()
+    return strings
+
+
+# Style indexes (the s attribute of a cell) whose number format is a date
+def _date_styles(archive):
+    from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+
+    if 'xl/styles.xml' not in archive.namelist():
+        return set()
+    styles = ET.fromstring(archive.read('xl/styles.xml'))
+    formats = dict(BUILTIN_FORMATS)
+    for num_fmt in styles.iter(_MAIN + 'numFmt'):
+        formats[int(num_fmt.get('numFmtId'))] = num_fmt.get('formatCode')
+    cell_xfs = styles.find(_MAIN + 'cellXfs')
+    if cell_xfs is None:
+        return set()
+    return {i for i, xf in enumerate(cell_xfs.iter(_MAIN + 'xf'))
+            if is_date_format(formats.get(int(xf.get('numFmtId', 0)), 'General'))}
+
+
+# Rows of the first worksheet as lists. The first non-empty row (the header)
+# is yielded in full; select(header), if given, then returns the column
+# indexes to keep, and every later row holds only those columns, in that
+# order. As in pd.read_excel, empty rows between data rows are kept (as
+# rows of None) and empty rows after the last data row are dropped.
+def iter_rows(source, select=None):
+    from openpyxl.utils.datetime import from_excel
+
+    with zipfile.ZipFile(source) as archive:
+        shared = _shared_strings(archive)
+        date_styles = _date_styles(archive)
+        sheet = archive.open(_first_sheet_path(archive))
+
+        wanted = None
+        width = 0
+        values = {}
+        has_data = False
+        next_index = 0
+        last_row = None
+        for _, element in ET.iterparse(sheet):
+            tag = element.tag
+            if tag == _CELL:
+                ref = element.get('r')
+                index = column_index(ref) if ref else next_index
+                next_index = index + 1
+                kind = element.get('t')
+                value = element.findtext(_VALUE)
+                if value or (kind == 'inlineStr' and len(element)):
+                    has_data = True
+                if wanted is not None and index not in wanted:
+                    continue
+                if kind == 'inlineStr':
+                    value = ''.join(t.text or '' for t in element.iter(_TEXT))
+                    if value not in NA_STRINGS:
+                        values[index] = value
+                    continue
+                # A formula without a cached result (<f>...</f><v/>) is an
+                # empty cell, as in pd.read_excel
+                if not value or kind == 'e':
+                    continue
+                if kind in ('s', 'str'):
+                    value = shared[int(value)] if kind == 's' else value
+                    if value in NA_STRINGS:
+                        continue
+                elif kind == 'b':
+                    value = value == '1'
+                elif kind in (None, 'n'):
+                    value = float(value) if ('.' in value or 'E' in value or 'e' in value) else int(value)
+                    if int(element.get('s', 0)) in date_styles:
+                        value = from_excel(value)
+                values[index] = value
+            elif tag == _ROW:
+                number = int(element.get('r')) if element.get('r') else (last_row or 0) + 1
+                if has_data:
+                    if last_row is None:
+                        # Header row
+                        row = [None] * (max(values) + 1 if values else 0)
+                        for index, value in values.items():
+                            row[index] = value
+                        width = len(row)
+                        if select is not None:
+                            wanted = {index: i for i, index in enumerate(select(row))}
+                            width = len(wanted)
+                    else:
+                        for _ in range(number - last_row - 1):
+                            yield [None] * width
+                        if wanted is None:
+                            row = [None] * max(width, max(values) + 1 if values else 0)
+                            for index, value in values.items():
+                                row[index] = value
+                        else:
+                            row = [None] * width
+                            for index, value in values.items():
+                                row[wanted[index]] = value
+                    last_row = number
+                    yield row
+                values = {}
+                has_data = False
+                next_index = 0
+                element.clear()